@@ -1,8 +1,62 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import functools
+import math
+from collections import deque
+from dataclasses import dataclass, field
+
 import numpy as np
-import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+try:
+    import bottleneck as bn
+except ImportError:
+    bn = None  # optional: rolling_stdev falls back to cumulative sums
+
+try:
+    from numba import njit, prange
+    _HAS_NUMBA = True
+except ImportError:
+    # numba is optional: without it the kernels below run as plain Python
+    _HAS_NUMBA = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+
+def _as_float_array(values):
+    """float32 input stays float32, anything else is converted to float64"""
+    arr = np.asarray(values)
+    return arr.astype(np.float32 if arr.dtype == np.float32 else float, copy=False)
+
+
+def _aligned_empty(n, dtype, align=64):
+    """Uninitialized 1-D array whose data pointer is aligned to `align` bytes (SIMD-friendly)"""
+    dtype = np.dtype(dtype)
+    buf = np.empty(n + align // dtype.itemsize, dtype=dtype)
+    offset = (-buf.ctypes.data) % align // dtype.itemsize
+    return buf[offset:offset + n]
+
+
+@functools.lru_cache(maxsize=32)
+def _alma_kernel(length, offset, sigma, dtype=np.float64):
+    """
+    Normalized Gaussian ALMA weights, k=0 (oldest) .. length-1 (newest).
+    Cached per parameter set and dtype; the returned array is shared, so it is read-only.
+    Weights are always computed and normalized in float64, then cast to dtype.
+    """
+    m = offset * (length - 1)
+    s = length / sigma
+
+    ks = np.arange(length, dtype=float)
+    weights = np.exp(-((ks - m) ** 2) / (2.0 * (s ** 2)))
+    kernel = (weights / weights.sum()).astype(dtype, copy=False)
+    kernel.setflags(write=False)
+    return kernel
 
 
 def pine_alma(series, length, offset, sigma):
@@ -13,31 +67,91 @@ def pine_alma(series, length, offset, sigma):
       w_k = exp(- (k - m)^2 / (2 * s^2)), k = 0..length-1
       ALMA[i] = sum_k w_k * src[i - (length-1 - k)] / sum_k
     """
-    series = np.asarray(series, dtype=float)
+    series = _as_float_array(series)
 
     if length <= 0 or len(series) < length:
-        return np.full_like(series, np.nan, dtype=float)
+        return np.full_like(series, np.nan)
 
-    m = offset * (length - 1)
-    s = length / sigma
-
-    ks = np.arange(length, dtype=float)
-    weights = np.exp(-((ks - m) ** 2) / (2.0 * (s ** 2)))
-    wsum = weights.sum()
+    kernel = _alma_kernel(length, offset, sigma, series.dtype.type)
 
-    alma_vals = np.full_like(series, np.nan, dtype=float)
+    alma_vals = np.full_like(series, np.nan)
 
     # Shift: k=0 is oldest, k=length-1 is newest
     # src index: i - (length - 1 - k)
-    for i in range(length - 1, len(series)):
-        window = series[i - (length - 1): i + 1]  # length = length
-        alma_vals[i] = np.dot(weights, window) / wsum
+    # Zero-copy (n - length + 1, length) view of every window, reduced with one matrix-vector product
+    windows = sliding_window_view(series, length)
+    alma_vals[length - 1:] = windows @ kernel
 
     return alma_vals
 
 
+def _constant_windows(series, length):
+    """Boolean mask over the len(series) - length + 1 windows, True where every value is equal"""
+    changes = np.zeros(len(series), dtype=np.int64)
+    np.cumsum(series[1:] != series[:-1], out=changes[1:])
+    return changes[length - 1:] == changes[:len(series) - length + 1]
+
+
+def rolling_stdev(series, length):
+    """
+    Rolling sample stdev (ddof=1), compatible with TradingView ta.stdev.
+    Uses bottleneck.move_std (C implementation) when bottleneck is installed; constant
+    windows are set to exactly 0, but its running sums can still lose a few digits on a
+    quiet window that follows a large move.
+    Otherwise uses cumulative sums of x and x^2 (O(n)), recomputing directly only the
+    windows where the sums lose precision.
+    """
+    series = _as_float_array(series)
+    n = len(series)
+
+    sd_vals = np.full(n, np.nan, dtype=series.dtype)
+    if length <= 1 or n < length:
+        return sd_vals
+
+    if bn is not None:
+        # Sums are accumulated in float64 like the other paths, the result keeps the input dtype
+        sd_vals = bn.move_std(series.astype(float), window=length, min_count=length, ddof=1)
+        sd_vals = sd_vals.astype(series.dtype, copy=False)
+        # move_std keeps running sums, which leave a small nonzero value on constant windows
+        sd_vals[length - 1:][_constant_windows(series, length)] = 0.0
+        return sd_vals
+
+    # Sums are always accumulated in float64, the result keeps the input dtype.
+    # Shifting by the first close does not change the variance but keeps the sums small.
+    x = np.subtract(series, series[0], dtype=float)
+    csum = np.cumsum(x, out=_aligned_empty(n, float))
+    x *= x
+    csum2 = np.cumsum(x, out=_aligned_empty(n, float))
+
+    # Window sums: csum[i] - csum[i - length], with the first window taken as is
+    s1 = csum[length - 1:].copy()
+    s1[1:] -= csum[:n - length]
+    ssd = csum2[length - 1:].copy()
+    ssd[1:] -= csum2[:n - length]
+    s1 *= s1
+    s1 /= length
+    ssd -= s1  # sum of squared deviations of each window
+
+    # The window sums carry an error of about eps * csum2[i]. Windows whose squared deviations
+    # are not well above it (a quiet stretch after a large move) are recomputed in two passes.
+    redo = np.flatnonzero(ssd <= 1e-8 * csum2[length - 1:])
+    if redo.size:
+        windows = sliding_window_view(series, length)[redo].astype(float)
+        windows -= windows[:, :1]
+        windows -= windows.mean(axis=1, keepdims=True)
+        ssd[redo] = np.einsum('ij,ij->i', windows, windows)
+
+    np.maximum(ssd, 0.0, out=ssd)
+    ssd /= length - 1
+    sd_vals[length - 1:] = np.sqrt(ssd, out=ssd)
+    # A constant window is exactly 0, as in ta.stdev
+    sd_vals[length - 1:][_constant_windows(series, length)] = 0.0
+
+    return sd_vals
+
+
 def generateSupertrend(close_array, high_array, low_array,
-                       sd_period, alma_period, alma_offset, alma_sigma, factor):
+                       sd_period, alma_period, alma_offset, alma_sigma, factor, dtype=np.float64, out=None):
     """
     Calculation to match the 'Alma SD SuperTrend' from the TradingView Pinescript (v6) example exactly.
     - sd = ta.stdev(src, sdlen)
@@ -45,88 +159,358 @@ def generateSupertrend(close_array, high_array, low_array,
     - Band update and direction logic are identical to the st() function in Pinescript.
 
     Note: high_array and low_array parameters are not used in the calculation (also not used in the Pine script).
+
+    dtype=np.float32 halves the memory traffic of the array passes; band state and
+    stdev sums are still accumulated in float64. The default stays float64 because
+    float32 keeps only ~7 significant digits, which can move a cross on high-priced symbols.
+
+    out: optional 1-D array of len(close_array) that receives the result (numpy-style),
+    so callers can reuse one buffer across symbols. It is returned.
     """
-    close_array = np.asarray(close_array, dtype=float)
+    # Contiguous input keeps the ufunc and BLAS passes on their vectorized paths
+    close_array = np.ascontiguousarray(close_array, dtype=dtype)
 
     n = len(close_array)
+    if out is None:
+        out = np.empty(n, dtype=dtype)
+    elif out.shape != (n,):
+        raise ValueError(f"out must have shape ({n},), got {out.shape}")
     if n == 0:
-        return np.array([], dtype=float)
+        return out
+
+    if _HAS_NUMBA:
+        # Single fused pass: ALMA, SD and bands are computed bar by bar without intermediate arrays
+        if alma_period <= 0:
+            out.fill(np.nan)
+            return out
+        kernel = _alma_kernel(alma_period, alma_offset, alma_sigma)
+        _alma_sd_supertrend(close_array, kernel, int(sd_period), float(factor), out)
+        return out
 
     # ALMA and SD arrays
     alma_array = pine_alma(close_array, alma_period, alma_offset, alma_sigma)
 
-    # Pandas rolling.std ddof=1 -> compatible with TradingView ta.stdev (sample stdev)
-    sd_series = pd.Series(close_array, dtype=float).rolling(window=sd_period).std(ddof=1)
-    sd_array = sd_series.to_numpy()
+    sd_array = rolling_stdev(close_array, sd_period)
 
-    # Start (first valid index)
-    alma_start = np.argmax(~np.isnan(alma_array)) if np.any(~np.isnan(alma_array)) else n
-    sd_start = np.argmax(~np.isnan(sd_array)) if np.any(~np.isnan(sd_array)) else n
+    # Start (first valid index), known from the window lengths
+    alma_start = alma_period - 1 if 0 < alma_period <= n else n
+    sd_start = sd_period - 1 if 1 < sd_period <= n else n
     if alma_start == n or sd_start == n:
-        return np.full_like(close_array, np.nan, dtype=float)
+        out.fill(np.nan)
+        return out
 
     start_index = max(alma_start, sd_start)
 
-    upperband = np.full(n, np.nan, dtype=float)  # mutating band
-    lowerband = np.full(n, np.nan, dtype=float)  # mutating band
-    supertrend = np.full(n, np.nan, dtype=float)
-    direction = np.full(n, np.nan, dtype=float)
+    _supertrend_core(close_array, alma_array, sd_array, float(factor), start_index, out)
+
+    # Only supertrend is returned for compatibility with the main script
+    return out
+
+
+def generateSupertrendBatch(close_matrix, sd_period, alma_period, alma_offset, alma_sigma, factor,
+                            dtype=np.float64):
+    """
+    generateSupertrend for many symbols at once.
+    close_matrix has shape (symbols, bars); every row must hold the same number of bars.
+    Returns a supertrend matrix of the same shape. With numba the rows are processed
+    in parallel by the fused kernel, otherwise generateSupertrend is applied row by row.
+    """
+    close_matrix = np.ascontiguousarray(close_matrix, dtype=dtype)
+    if close_matrix.ndim != 2:
+        raise ValueError("close_matrix must be 2-D (symbols, bars)")
+
+    if _HAS_NUMBA and alma_period > 0:
+        kernel = _alma_kernel(alma_period, alma_offset, alma_sigma)
+        return _supertrend_batch(close_matrix, kernel, int(sd_period), float(factor))
+
+    out = np.empty_like(close_matrix)
+    for s in range(close_matrix.shape[0]):
+        row = close_matrix[s]
+        generateSupertrend(row, row, row, sd_period, alma_period, alma_offset, alma_sigma, factor,
+                           dtype=dtype, out=out[s])
+    return out
+
+
+# Per-bar signal states returned by classify()
+NEUTRAL = 0
+BULL = 1
+BEAR = 2
+LONG_CROSS = 3
+SHORT_CROSS = 4
 
-    for i in range(start_index, n):
-        alma_i = alma_array[i]
-        sd_i = sd_array[i]
-        if np.isnan(alma_i) or np.isnan(sd_i):
-            continue
+
+def classify(supertrend, close):
+    """
+    Signal state of every bar, from the supertrend/close relation on that bar and the one before:
+    - LONG_CROSS:  supertrend moved from above close to below it
+    - SHORT_CROSS: supertrend moved from below close to above it
+    - BULL / BEAR: supertrend stayed below / above close on both bars
+    - NEUTRAL:     anything else, including the first bar and NaN (warm-up) bars
+    Returns an int8 array the length of close.
+    """
+    supertrend = np.asarray(supertrend)
+    close = np.asarray(close)
+    state = np.zeros(len(close), dtype=np.int8)
+    if len(close) < 2:
+        return state
+
+    below = supertrend < close  # NaN compares False on both sides, so warm-up bars stay NEUTRAL
+    above = supertrend > close
+    prev_below, cur_below = below[:-1], below[1:]
+    prev_above, cur_above = above[:-1], above[1:]
+
+    state[1:] = np.select(
+        [prev_above & cur_below, prev_below & cur_above, prev_below & cur_below, prev_above & cur_above],
+        [LONG_CROSS, SHORT_CROSS, BULL, BEAR],
+        default=NEUTRAL,
+    )
+    return state
+
+
+@dataclass
+class SupertrendState:
+    """
+    Incremental ALMA SD Supertrend for live polling.
+    update() appends one closed bar and returns its supertrend value in
+    O(sd_period + alma_period), instead of re-running generateSupertrend on the
+    whole history. Feeding a series bar by bar gives the same values as
+    generateSupertrend on that series.
+
+    stdev is recomputed over the sd_period window on each update rather than
+    kept as running sums, so an indefinitely long live run does not drift.
+    """
+    sd_period: int
+    alma_period: int
+    alma_offset: float
+    alma_sigma: float
+    factor: float
+
+    bars: int = 0
+    upperband: float = math.nan
+    lowerband: float = math.nan
+    supertrend: float = math.nan
+    direction: int = 1
+    closes: deque = field(init=False, repr=False)
+    weights: tuple = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.closes = deque(maxlen=max(self.sd_period, self.alma_period, 1))
+        kernel = _alma_kernel(self.alma_period, self.alma_offset, self.alma_sigma) if self.alma_period > 0 else ()
+        self.weights = tuple(float(w) for w in kernel)
+
+    @classmethod
+    def from_history(cls, close_array, sd_period, alma_period, alma_offset, alma_sigma, factor):
+        """Build a state warmed up with an existing close series"""
+        state = cls(sd_period, alma_period, alma_offset, alma_sigma, factor)
+        for close in close_array:
+            state.update(close)
+        return state
+
+    def update(self, close: float) -> float:
+        """Append one bar, return its supertrend (NaN until ALMA and SD are both valid)"""
+        close = float(close)
+        prev_close = self.closes[-1] if self.closes else math.nan
+        self.closes.append(close)
+        self.bars += 1
+
+        i = self.bars - 1
+        start_index = max(self.alma_period - 1, self.sd_period - 1)
+        if self.alma_period <= 0 or self.sd_period <= 1 or i < start_index:
+            return math.nan
+
+        recent = list(self.closes)
+
+        # ALMA over the last alma_period closes
+        alma_i = sum(w * c for w, c in zip(self.weights, recent[-self.alma_period:]))
+
+        # Sample stdev (ddof=1) over the last sd_period closes, relative to the first one
+        # (same as the kernels): a constant window is exactly 0
+        window = recent[-self.sd_period:]
+        first = window[0]
+        mean = sum(c - first for c in window) / self.sd_period
+        var = sum((c - first - mean) ** 2 for c in window) / (self.sd_period - 1)
+        sd_i = math.sqrt(var)
 
         # Basic bands
-        ub_basic = alma_i + factor * sd_i
-        lb_basic = alma_i - factor * sd_i
+        ub_basic = alma_i + self.factor * sd_i
+        lb_basic = alma_i - self.factor * sd_i
 
-        # Previous bands
-        if i > start_index and not np.isnan(upperband[i - 1]):
-            prev_ub = upperband[i - 1]
+        if i == start_index:
+            # nz(upperband[1]) / nz(lowerband[1]) fall back to the basic bands
+            cur_ub = ub_basic
+            cur_lb = lb_basic
+            # if na(sd[1]) direction := 1, otherwise supertrend[1] is na and the lower band decides
+            if i == self.sd_period - 1:
+                cur_dir = 1
+            else:
+                cur_dir = 1 if close < cur_lb else -1
         else:
-            prev_ub = ub_basic  # Matches the first bar behavior of nz(upperband[1]) in Pine
+            prev_ub, prev_lb = self.upperband, self.lowerband
+            cur_ub = ub_basic if (ub_basic < prev_ub) or (prev_close > prev_ub) else prev_ub
+            cur_lb = lb_basic if (lb_basic > prev_lb) or (prev_close < prev_lb) else prev_lb
 
-        if i > start_index and not np.isnan(lowerband[i - 1]):
-            prev_lb = lowerband[i - 1]
-        else:
-            prev_lb = lb_basic
+            # else if prevsupertrend == prevupperband (see _supertrend_core)
+            if self.direction == 1 or prev_lb == prev_ub:
+                cur_dir = -1 if close > cur_ub else 1
+            else:
+                cur_dir = 1 if close < cur_lb else -1
+
+        self.upperband = cur_ub
+        self.lowerband = cur_lb
+        self.direction = cur_dir
+        self.supertrend = cur_lb if cur_dir == -1 else cur_ub
+        return self.supertrend
+
+
+@njit(cache=True)
+def _supertrend_core(close_array, alma_array, sd_array, factor, start_index, supertrend):
+    """
+    Band update and direction loop of the Pine st() function.
+    Each bar depends on the previous bar's bands, so this cannot be vectorized;
+    it is compiled with numba when available. NaN checks use x != x so they
+    stay valid inside the compiled code.
+    start_index must be the first bar where both alma_array and sd_array are valid.
+    The result is written into supertrend (same length as close_array).
+    """
+    n = len(close_array)
+    # Bands and direction only live as scalar state; supertrend is the only array written
+    supertrend[:start_index] = np.nan
+
+    # First valid bar: nz(upperband[1]) / nz(lowerband[1]) fall back to the basic bands
+    i = start_index
+    prev_ub = alma_array[i] + factor * sd_array[i]
+    prev_lb = alma_array[i] - factor * sd_array[i]
+
+    # if na(sd[1]) direction := 1, otherwise supertrend[1] is na and the lower band decides
+    if i == 0 or sd_array[i - 1] != sd_array[i - 1]:
+        prev_dir = 1
+    else:
+        prev_dir = 1 if close_array[i] < prev_lb else -1
+    prev_close = close_array[i]
+
+    supertrend[i] = prev_lb if prev_dir == -1 else prev_ub
 
-        # Band update (same conditions as Pine)
-        prev_close = close_array[i - 1] if i > 0 else np.nan
+    # ALMA and SD have a single NaN prefix, so every bar after start_index is valid.
+    # State of the previous bar is carried in scalars instead of being re-read from the arrays.
+    # Band updates use non-short-circuit | and a select, which LLVM lowers to conditional moves.
+    for i in range(start_index + 1, n):
+        close_i = close_array[i]
+
+        # Basic bands
+        ub_basic = alma_array[i] + factor * sd_array[i]
+        lb_basic = alma_array[i] - factor * sd_array[i]
 
         # upperband := upperband < prevupperband or close[1] > prevupperband ? upperband : prevupperband
-        if (ub_basic < prev_ub) or (not np.isnan(prev_close) and prev_close > prev_ub):
-            upperband[i] = ub_basic
-        else:
-            upperband[i] = prev_ub
+        cond_ub = (ub_basic < prev_ub) | (prev_close > prev_ub)
+        cur_ub = ub_basic if cond_ub else prev_ub
 
         # lowerband := lowerband > prevlowerband or close[1] < prevlowerband ? lowerband : prevlowerband
-        if (lb_basic > prev_lb) or (not np.isnan(prev_close) and prev_close < prev_lb):
-            lowerband[i] = lb_basic
-        else:
-            lowerband[i] = prev_lb
+        cond_lb = (lb_basic > prev_lb) | (prev_close < prev_lb)
+        cur_lb = lb_basic if cond_lb else prev_lb
 
         # Direction and supertrend (identical to Pine st())
-        prev_super = supertrend[i - 1] if i > 0 else np.nan
-        prev_ub_mut = upperband[i - 1] if i > 0 else np.nan
-        prev_lb_mut = lowerband[i - 1] if i > 0 else np.nan
+        # else if prevsupertrend == prevupperband: the previous supertrend was the upper band
+        # when direction was 1, or when both bands coincided. That needs sd to be exactly 0
+        # on a constant window, which rolling_stdev and the fused kernel guarantee.
+        if prev_dir == 1 or prev_lb == prev_ub:
+            # direction := close > upperband ? -1 : 1
+            cur_dir = -1 if close_i > cur_ub else 1
+        else:
+            # else direction := close < lowerband ? 1 : -1
+            cur_dir = 1 if close_i < cur_lb else -1
+
+        # supertrend := direction == -1 ? lowerband : upperband
+        cur_super = cur_lb if cur_dir == -1 else cur_ub
+
+        supertrend[i] = cur_super
+
+        prev_ub, prev_lb, prev_dir, prev_close = cur_ub, cur_lb, cur_dir, close_i
+
 
-        # if na(sd[1]) direction := 1
-        if i - 1 < 0 or np.isnan(sd_array[i - 1]):
-            direction[i] = 1
+@njit(cache=True)
+def _alma_sd_supertrend(close_array, weights_norm, sd_period, factor, supertrend):
+    """
+    Fused ALMA + stdev + Supertrend kernel (one pass over close_array).
+    - ALMA[i] is the dot product of weights_norm with the last len(weights_norm) closes
+    - stdev (ddof=1) is taken per window with two passes, O(sd_period) like the ALMA dot product
+    - band and direction logic is the same as _supertrend_core
+    The result is written into supertrend (same length as close_array).
+    """
+    n = len(close_array)
+    length = len(weights_norm)
+    if length == 0 or sd_period <= 1 or n < length or n < sd_period:
+        supertrend[:] = np.nan
+        return
+
+    start_index = max(length - 1, sd_period - 1)
+    supertrend[:start_index] = np.nan
+
+    prev_ub = 0.0
+    prev_lb = 0.0
+    prev_dir = 1
+    prev_close = 0.0
+
+    for i in range(start_index, n):
+        close_i = close_array[i]
+
+        # Two-pass stdev over close[i - sd_period + 1 .. i], relative to the window's first close
+        # (same as rolling_stdev): a constant window is exactly 0, as in ta.stdev
+        base = i - sd_period + 1
+        first = close_array[base]
+        mean = 0.0
+        for k in range(1, sd_period):
+            mean += close_array[base + k] - first
+        mean /= sd_period
+        ssq = 0.0
+        for k in range(sd_period):
+            d = close_array[base + k] - first - mean
+            ssq += d * d
+        sd_i = np.sqrt(ssq / (sd_period - 1))
+
+        # ALMA over close[i - length + 1 .. i]
+        alma_i = 0.0
+        base = i - length + 1
+        for k in range(length):
+            alma_i += weights_norm[k] * close_array[base + k]
+
+        # Basic bands
+        ub_basic = alma_i + factor * sd_i
+        lb_basic = alma_i - factor * sd_i
+
+        if i == start_index:
+            # nz(upperband[1]) / nz(lowerband[1]) fall back to the basic bands
+            cur_ub = ub_basic
+            cur_lb = lb_basic
+            # if na(sd[1]) direction := 1, otherwise supertrend[1] is na and the lower band decides
+            if i == sd_period - 1:
+                cur_dir = 1
+            else:
+                cur_dir = 1 if close_i < cur_lb else -1
         else:
-            # else if prevsupertrend == prevupperband
-            if not np.isnan(prev_super) and not np.isnan(prev_ub_mut) and (prev_super == prev_ub_mut):
-                # direction := close > upperband ? -1 : 1
-                direction[i] = -1 if close_array[i] > upperband[i] else 1
+            # upperband := upperband < prevupperband or close[1] > prevupperband ? upperband : prevupperband
+            cond_ub = (ub_basic < prev_ub) | (prev_close > prev_ub)
+            cur_ub = ub_basic if cond_ub else prev_ub
+
+            # lowerband := lowerband > prevlowerband or close[1] < prevlowerband ? lowerband : prevlowerband
+            cond_lb = (lb_basic > prev_lb) | (prev_close < prev_lb)
+            cur_lb = lb_basic if cond_lb else prev_lb
+
+            # else if prevsupertrend == prevupperband (see _supertrend_core)
+            if prev_dir == 1 or prev_lb == prev_ub:
+                cur_dir = -1 if close_i > cur_ub else 1
             else:
-                # else direction := close < lowerband ? 1 : -1
-                direction[i] = 1 if close_array[i] < lowerband[i] else -1
+                cur_dir = 1 if close_i < cur_lb else -1
 
         # supertrend := direction == -1 ? lowerband : upperband
-        supertrend[i] = lowerband[i] if direction[i] == -1 else upperband[i]
+        supertrend[i] = cur_lb if cur_dir == -1 else cur_ub
 
-    # Only supertrend is returned for compatibility with the main script
-    return supertrend
+        prev_ub, prev_lb, prev_dir, prev_close = cur_ub, cur_lb, cur_dir, close_i
+
+
+@njit(cache=True, parallel=True)
+def _supertrend_batch(close_matrix, weights_norm, sd_period, factor):
+    """Run _alma_sd_supertrend over every row of close_matrix, one row per thread"""
+    out = np.empty_like(close_matrix)
+    for s in prange(close_matrix.shape[0]):
+        _alma_sd_supertrend(close_matrix[s], weights_norm, sd_period, factor, out[s])
+    return out
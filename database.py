@@ -6,14 +6,206 @@ Trading Bot Database Module
 SQLite database management and all database operations
 """
 
+import atexit
 import sqlite3
 import logging
+import threading
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, NamedTuple
 from contextlib import contextmanager
 import json
 
+# Current local time as an ISO-8601 string, evaluated inside SQLite (same format family as datetime.isoformat())
+_SQL_NOW = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+
+# Hot-path statements, kept as constants so they hit the connection's statement cache
+_SQL_INSERT_TRADE = f'''
+    INSERT INTO trades (symbol, side, quantity, price, value, order_id,
+                        status, is_dry_run, trade_date, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, {_SQL_NOW})
+'''
+
+_SQL_UPSERT_PORTFOLIO = f'''
+    INSERT INTO portfolio (asset, free, locked, total, usd_value, current_price, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?, {_SQL_NOW})
+    ON CONFLICT(asset) DO UPDATE SET
+        free = excluded.free,
+        locked = excluded.locked,
+        total = excluded.total,
+        usd_value = excluded.usd_value,
+        current_price = excluded.current_price,
+        updated_at = excluded.updated_at
+'''
+
+_SQL_INSERT_SIGNAL = f'''
+    INSERT INTO signals (symbol, signal_type, direction, signal_price,
+                         current_price, supertrend_value, is_processed, created_at)
+    VALUES (?, ?, ?, ?, ?, ?, 0, {_SQL_NOW})
+'''
+
+_SQL_MARK_SIGNAL_PROCESSED = 'UPDATE signals SET is_processed = 1 WHERE id = ?'
+
+# Full schema, run as one script by _init_database. Everything is IF NOT EXISTS so it also upgrades older files.
+_SCHEMA_SQL = f'''
+-- Markets table - Markets to be traded
+CREATE TABLE IF NOT EXISTS markets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT UNIQUE NOT NULL,
+    quantity INTEGER NOT NULL DEFAULT 0,
+    buy_all INTEGER NOT NULL DEFAULT 0,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    trend TEXT,
+    created_at TEXT NOT NULL DEFAULT ({_SQL_NOW}),
+    updated_at TEXT NOT NULL DEFAULT ({_SQL_NOW})
+);
+
+-- Trades table - Executed trades
+CREATE TABLE IF NOT EXISTS trades (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT NOT NULL,
+    side TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    price REAL NOT NULL,
+    value REAL NOT NULL,
+    order_id TEXT,
+    status TEXT NOT NULL,
+    is_dry_run INTEGER NOT NULL DEFAULT 0,
+    trade_date TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT ({_SQL_NOW})
+);
+
+-- Portfolio table - Current portfolio status
+CREATE TABLE IF NOT EXISTS portfolio (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    asset TEXT UNIQUE NOT NULL,
+    free REAL NOT NULL DEFAULT 0,
+    locked REAL NOT NULL DEFAULT 0,
+    total REAL NOT NULL DEFAULT 0,
+    usd_value REAL NOT NULL DEFAULT 0,
+    current_price REAL NOT NULL DEFAULT 0,
+    updated_at TEXT NOT NULL DEFAULT ({_SQL_NOW})
+);
+
+-- Portfolio History - Portfolio value history
+CREATE TABLE IF NOT EXISTS portfolio_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    total_value REAL NOT NULL,
+    usdt_balance REAL NOT NULL,
+    crypto_value REAL NOT NULL,
+    snapshot_date TEXT NOT NULL,
+    created_at TEXT NOT NULL DEFAULT ({_SQL_NOW})
+);
+
+-- API Keys table
+CREATE TABLE IF NOT EXISTS api_keys (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    api_key TEXT UNIQUE NOT NULL,
+    description TEXT,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    created_at TEXT NOT NULL DEFAULT ({_SQL_NOW}),
+    last_used_at TEXT
+);
+
+-- Bot Config table - Bot settings
+CREATE TABLE IF NOT EXISTS bot_config (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT UNIQUE NOT NULL,
+    value TEXT NOT NULL,
+    description TEXT,
+    updated_at TEXT NOT NULL DEFAULT ({_SQL_NOW})
+);
+
+-- Signals table - Trading signals
+CREATE TABLE IF NOT EXISTS signals (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    symbol TEXT NOT NULL,
+    signal_type TEXT NOT NULL,
+    direction TEXT NOT NULL,
+    signal_price REAL NOT NULL,
+    current_price REAL NOT NULL,
+    supertrend_value REAL NOT NULL,
+    is_processed INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT ({_SQL_NOW})
+);
+
+-- Indices
+CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades(symbol);
+CREATE INDEX IF NOT EXISTS idx_trades_date ON trades(trade_date);
+CREATE INDEX IF NOT EXISTS idx_signals_symbol ON signals(symbol);
+CREATE INDEX IF NOT EXISTS idx_signals_processed ON signals(is_processed);
+-- Compound indexes for the dashboard queries: get_trades filters on (is_dry_run, symbol)
+-- and sorts by trade_date; unprocessed signals are looked up per symbol
+CREATE INDEX IF NOT EXISTS idx_trades_hot ON trades(is_dry_run, symbol, trade_date DESC);
+CREATE INDEX IF NOT EXISTS idx_signals_hot ON signals(is_processed, symbol);
+-- get_trade_stats aggregates per side
+CREATE INDEX IF NOT EXISTS idx_trades_side ON trades(is_dry_run, side);
+
+-- One row per snapshot_date (needed by the upsert in add_portfolio_snapshot). Older databases may
+-- hold duplicates from concurrent runs: keep the latest row per day before adding the constraint.
+DELETE FROM portfolio_history
+WHERE id NOT IN (SELECT MAX(id) FROM portfolio_history GROUP BY snapshot_date);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_ph_snapshot_date ON portfolio_history(snapshot_date);
+DROP INDEX IF EXISTS idx_ph_date;  -- superseded by idx_ph_snapshot_date
+'''
+
+# Column -> API key maps for the list readers; the SELECT column list is built from the keys so each
+# row converts with a single dict(zip(...)) instead of per-name sqlite3.Row lookups
+_MARKET_KEYS = {
+    'id': 'id',
+    'symbol': 'symbol',
+    'quantity': 'quantity',
+    'buy_all': 'buyAll',
+    'is_active': 'isActive',
+    'trend': 'trend',
+    'created_at': 'createdAt',
+    'updated_at': 'updatedAt',
+}
+
+_TRADE_KEYS = {
+    'id': 'id',
+    'symbol': 'symbol',
+    'side': 'side',
+    'quantity': 'quantity',
+    'price': 'price',
+    'value': 'value',
+    'order_id': 'orderId',
+    'status': 'status',
+    'is_dry_run': 'isDryRun',
+    'trade_date': 'date',
+}
+
+_PORTFOLIO_KEYS = {
+    'asset': 'asset',
+    'free': 'free',
+    'locked': 'locked',
+    'total': 'total',
+    'usd_value': 'usdValue',
+    'current_price': 'currentPrice',
+    'updated_at': 'updatedAt',
+}
+
+
+class MarketRow(NamedTuple):
+    """What the bot needs of a market, as returned by get_market_rows"""
+    symbol: str
+    quantity: int
+    buyAll: bool
+
+
+# Stored in PRAGMA user_version; bump whenever _SCHEMA_SQL or _init_database changes
+_SCHEMA_VERSION = 5
+
+# UPDATE/INSERT ... RETURNING needs SQLite 3.35+
+_SQLITE_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Size of sqlite3's per-connection prepared statement cache (default 128)
+_STATEMENT_CACHE_SIZE = 256
+
+# Seconds between background PRAGMA optimize runs
+_OPTIMIZE_INTERVAL = 900
+
+
 class TradingDatabase:
     """SQLite database management class"""
     
@@ -30,22 +222,155 @@ class TradingDatabase:
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         
         logging.info(f"Database path: {self.db_path}")
-        self._init_database()
+        
+        # One long-lived connection (keeps its page cache between calls), shared across threads behind a lock.
+        # isolation_level=None: transactions are opened explicitly in get_connection.
+        # No row_factory: writes never build sqlite3.Row objects, readers that need names use _row_cursor
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None,
+                                     cached_statements=_STATEMENT_CACHE_SIZE)
+        self._configure_connection()
+        self._closed = False
+        
+        # Decoded bot_config values; this process is the only writer, set_config keeps it current
+        self._config_cache: Dict[str, Any] = {}
+        
+        try:
+            self._init_database()
+        except Exception:
+            # No timer or read-only connection exists yet, so close() cannot be used here
+            self._closed = True
+            self._conn.close()
+            raise
+        
+        # Separate read-only connection for the SELECT-only methods: under WAL it reads the last committed
+        # state without waiting for the writer lock. Not possible for :memory: (private to its connection).
+        self._ro_lock = threading.Lock()
+        self._ro_conn = None
+        if str(self.db_path) != ':memory:':
+            self._ro_conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True,
+                                            check_same_thread=False, isolation_level=None,
+                                            cached_statements=_STATEMENT_CACHE_SIZE)
+            self._ro_conn.execute('PRAGMA query_only=1')
+            self._ro_conn.execute('PRAGMA temp_store=MEMORY')
+            self._ro_conn.execute('PRAGMA cache_size=-64000')
+            self._ro_conn.execute('PRAGMA mmap_size=268435456')
+            self._ro_conn.execute('PRAGMA busy_timeout=5000')
+        
+        self._schedule_optimize()
+        # Registered last: close() needs the timer and both connections
+        atexit.register(self.close)
+    
+    def _configure_connection(self):
+        """Apply PRAGMAs to the shared connection (must run outside a transaction)"""
+        conn = self._conn
+        # WAL lets readers run alongside the writer; with synchronous=NORMAL commits no longer fsync each time
+        if str(self.db_path) != ':memory:':
+            conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA cache_size=-64000')  # ~64 MB page cache
+        conn.execute('PRAGMA mmap_size=268435456')  # 256 MB
+        conn.execute('PRAGMA busy_timeout=5000')
+    
+    def close(self):
+        """Close the shared connection (refreshing planner statistics first)"""
+        with self._lock:
+            if self._closed:
+                return
+            self._optimize_timer.cancel()
+            self.optimize()
+            self._closed = True
+            self._conn.close()
+        if self._ro_conn is not None:
+            with self._ro_lock:
+                self._ro_conn.close()
+    
+    def optimize(self):
+        """Run PRAGMA optimize: re-ANALYZE tables whose statistics have gone stale as they grew"""
+        try:
+            with self._lock:
+                self._conn.execute('PRAGMA optimize')
+        except sqlite3.Error as e:
+            logging.warning(f"Database optimize error: {e}")
+    
+    def _schedule_optimize(self):
+        """Arm the background timer for the next periodic optimize"""
+        self._optimize_timer = threading.Timer(_OPTIMIZE_INTERVAL, self._periodic_optimize)
+        self._optimize_timer.daemon = True
+        self._optimize_timer.start()
+    
+    def _periodic_optimize(self):
+        """Timer callback: optimize and re-arm until the database is closed"""
+        with self._lock:
+            if self._closed:
+                return
+            self.optimize()
+            self._schedule_optimize()
+    
+    @staticmethod
+    def _row_cursor(conn) -> sqlite3.Cursor:
+        """Cursor returning sqlite3.Row (name access); the connection itself yields plain tuples"""
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        return cursor
     
     @contextmanager
     def get_connection(self):
-        """Secure database connection with context manager"""
-        conn = sqlite3.connect(str(self.db_path))
-        conn.row_factory = sqlite3.Row  # Dict-like access
-        try:
+        """Shared connection with one transaction per (outermost) block"""
+        with self._lock:
+            conn = self._conn
+            if conn.in_transaction:
+                # Nested use joins the transaction that is already open
+                yield conn
+                return
+            
+            conn.execute('BEGIN')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                logging.error(f"Database error: {e}")
+                raise
+    
+    @contextmanager
+    def transaction(self):
+        """Group several operations into one commit
+        
+        Every method called inside the block joins its transaction; it commits when the block
+        exits and rolls back if the block raises. Keep the block free of awaits and network I/O:
+        the database lock is held for its whole duration.
+        """
+        with self.get_connection() as conn:
             yield conn
-            conn.commit()
-        except Exception as e:
-            conn.rollback()
-            logging.error(f"Database error: {e}")
-            raise
-        finally:
-            conn.close()
+    
+    @contextmanager
+    def get_read_connection(self):
+        """Read-only connection for SELECT-only methods"""
+        if self._ro_conn is None:
+            with self.get_connection() as conn:
+                yield conn
+            return
+        
+        # Inside this thread's own write transaction, read through it so uncommitted changes are visible.
+        # (If another thread holds the writer lock the acquire fails and we read committed state instead.)
+        if self._lock.acquire(blocking=False):
+            try:
+                if self._conn.in_transaction:
+                    with self.get_connection() as conn:
+                        yield conn
+                    return
+            finally:
+                self._lock.release()
+        
+        with self._ro_lock:
+            try:
+                yield self._ro_conn
+            except Exception as e:
+                logging.error(f"Database error: {e}")
+                raise
 
     # Helper function to add a column to an existing table
     def _check_and_add_column(self, cursor, table_name: str, column_name: str, column_type: str):
@@ -53,7 +378,7 @@ class TradingDatabase:
         try:
             # Check for column existence
             cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = [row['name'] for row in cursor.fetchall()]
+            columns = [row[1] for row in cursor.fetchall()]  # (cid, name, type, ...)
             
             if column_name not in columns:
                 logging.info(f"Adding column '{column_name}' to table '{table_name}'...")
@@ -64,116 +389,34 @@ class TradingDatabase:
     # <<< END OF CHANGE >>>
     
     def _init_database(self):
-        """Initialize/create the database tables"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            # Markets table - Markets to be traded
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS markets (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT UNIQUE NOT NULL,
-                    quantity INTEGER NOT NULL DEFAULT 0,
-                    buy_all INTEGER NOT NULL DEFAULT 0,
-                    is_active INTEGER NOT NULL DEFAULT 1,
-                    trend TEXT, 
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL
-                )
-            ''')
-            
-            # Trades table - Executed trades
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS trades (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT NOT NULL,
-                    side TEXT NOT NULL,
-                    quantity REAL NOT NULL,
-                    price REAL NOT NULL,
-                    value REAL NOT NULL,
-                    order_id TEXT,
-                    status TEXT NOT NULL,
-                    is_dry_run INTEGER NOT NULL DEFAULT 0,
-                    trade_date TEXT NOT NULL,
-                    created_at TEXT NOT NULL
-                )
-            ''')
-            
-            # Portfolio table - Current portfolio status
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS portfolio (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    asset TEXT UNIQUE NOT NULL,
-                    free REAL NOT NULL DEFAULT 0,
-                    locked REAL NOT NULL DEFAULT 0,
-                    total REAL NOT NULL DEFAULT 0,
-                    usd_value REAL NOT NULL DEFAULT 0,
-                    current_price REAL NOT NULL DEFAULT 0,
-                    updated_at TEXT NOT NULL
-                )
-            ''')
-            
-            # Portfolio History - Portfolio value history
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS portfolio_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    total_value REAL NOT NULL,
-                    usdt_balance REAL NOT NULL,
-                    crypto_value REAL NOT NULL,
-                    snapshot_date TEXT NOT NULL,
-                    created_at TEXT NOT NULL
-                )
-            ''')
-            
-            # API Keys table
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS api_keys (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    api_key TEXT UNIQUE NOT NULL,
-                    description TEXT,
-                    is_active INTEGER NOT NULL DEFAULT 1,
-                    created_at TEXT NOT NULL,
-                    last_used_at TEXT
-                )
-            ''')
-            
-            # Bot Config table - Bot settings
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS bot_config (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    key TEXT UNIQUE NOT NULL,
-                    value TEXT NOT NULL,
-                    description TEXT,
-                    updated_at TEXT NOT NULL
-                )
-            ''')
-            
-            # Signals table - Trading signals
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS signals (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    symbol TEXT NOT NULL,
-                    signal_type TEXT NOT NULL,
-                    direction TEXT NOT NULL,
-                    signal_price REAL NOT NULL,
-                    current_price REAL NOT NULL,
-                    supertrend_value REAL NOT NULL,
-                    is_processed INTEGER NOT NULL DEFAULT 0,
-                    created_at TEXT NOT NULL
-                )
-            ''')
-            
-            # Indices
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_trades_symbol ON trades(symbol)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_trades_date ON trades(trade_date)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_signals_symbol ON signals(symbol)')
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_signals_processed ON signals(is_processed)')
-
-            # Check existing 'markets' table and add 'trend' column
-            self._check_and_add_column(cursor, 'markets', 'trend', 'TEXT')
-            
-            conn.commit()
-            logging.info("Database tables created/verified successfully")
+        """Initialize/create the database tables (skipped when user_version is already current)"""
+        with self._lock:
+            conn = self._conn
+            
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version >= _SCHEMA_VERSION:
+                logging.info(f"Database schema is up to date (version {version})")
+                return
+            
+            # executescript commits any open transaction first, so it can't run inside get_connection;
+            # the script opens its own transaction and everything below commits together
+            try:
+                conn.executescript(f'BEGIN IMMEDIATE;\n{_SCHEMA_SQL}')
+                
+                # Check existing 'markets' table and add 'trend' column
+                self._check_and_add_column(conn.cursor(), 'markets', 'trend', 'TEXT')
+                
+                # Refresh planner statistics so the new indexes are picked up right away
+                conn.execute('ANALYZE')
+                
+                conn.execute(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+                conn.execute('COMMIT')
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                logging.error(f"Database error: {e}")
+                raise
+            logging.info(f"Database tables created/verified successfully (schema version {_SCHEMA_VERSION})")
     
     # ============ MARKETS OPERATIONS ============
     
@@ -182,47 +425,57 @@ class TradingDatabase:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                now = datetime.now().isoformat()
-                cursor.execute('''
-                    INSERT INTO markets (symbol, quantity, buy_all, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (symbol, quantity, 1 if buy_all else 0, now, now))
-                logging.info(f"Market added: {symbol}")
-                return True
-        except sqlite3.IntegrityError:
-            logging.warning(f"Market already exists: {symbol}")
-            return False
+                cursor.execute(f'''
+                    INSERT OR IGNORE INTO markets (symbol, quantity, buy_all, created_at, updated_at)
+                    VALUES (?, ?, ?, {_SQL_NOW}, {_SQL_NOW})
+                ''', (symbol, quantity, 1 if buy_all else 0))
+                
+                # rowcount is 0 when the symbol already exists and the insert was ignored
+                # (an ignored insert still advances the AUTOINCREMENT counter, so ids can have gaps)
+                if cursor.rowcount > 0:
+                    logging.info(f"Market added: {symbol}")
+                    return True
+                logging.warning(f"Market already exists: {symbol}")
+                return False
         except Exception as e:
             logging.error(f"Market addition error: {e}")
             return False
     
     def get_markets(self, active_only: bool = True) -> List[Dict[str, Any]]:
         """Get all markets"""
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
-            query = 'SELECT * FROM markets'
+            query = f"SELECT {', '.join(_MARKET_KEYS)} FROM markets"
             if active_only:
                 query += ' WHERE is_active = 1'
             query += ' ORDER BY symbol'
             
             cursor.execute(query)
-            rows = cursor.fetchall()
             
-            return [{
-                'id': row['id'],
-                'symbol': row['symbol'],
-                'quantity': row['quantity'],
-                'buyAll': bool(row['buy_all']),
-                'isActive': bool(row['is_active']),
-                'trend': row['trend'], # Added
-                'createdAt': row['created_at'],
-                'updatedAt': row['updated_at']
-            } for row in rows]
+            keys = tuple(_MARKET_KEYS.values())
+            markets = []
+            for row in cursor:
+                market = dict(zip(keys, row))
+                market['buyAll'] = bool(market['buyAll'])
+                market['isActive'] = bool(market['isActive'])
+                markets.append(market)
+            return markets
+    
+    def get_market_rows(self, active_only: bool = True) -> List[MarketRow]:
+        """Get (symbol, quantity, buyAll) of all markets, unpackable without dict lookups"""
+        with self.get_read_connection() as conn:
+            query = 'SELECT symbol, quantity, buy_all FROM markets'
+            if active_only:
+                query += ' WHERE is_active = 1'
+            query += ' ORDER BY symbol'
+            
+            return [MarketRow(symbol, quantity, bool(buy_all))
+                    for symbol, quantity, buy_all in conn.execute(query)]
     
     def get_market(self, symbol: str) -> Optional[Dict[str, Any]]:
         """Get a single market"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_read_connection() as conn:
+            cursor = self._row_cursor(conn)
             cursor.execute('SELECT * FROM markets WHERE symbol = ?', (symbol,))
             row = cursor.fetchone()
             
@@ -260,8 +513,7 @@ class TradingDatabase:
                 if not updates: # If there's nothing to update
                     return True
                 
-                updates.append('updated_at = ?')
-                params.append(datetime.now().isoformat())
+                updates.append(f'updated_at = {_SQL_NOW}')
                 params.append(symbol)
                 
                 query = f"UPDATE markets SET {', '.join(updates)} WHERE symbol = ?"
@@ -280,10 +532,10 @@ class TradingDatabase:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                cursor.execute('''
-                    UPDATE markets SET is_active = 0, updated_at = ?
+                cursor.execute(f'''
+                    UPDATE markets SET is_active = 0, updated_at = {_SQL_NOW}
                     WHERE symbol = ?
-                ''', (datetime.now().isoformat(), symbol))
+                ''', (symbol,))
                 
                 if cursor.rowcount > 0:
                     logging.info(f"Market deleted: {symbol}")
@@ -293,6 +545,26 @@ class TradingDatabase:
             logging.error(f"Market deletion error: {e}")
             return False
     
+    def bulk_add_markets(self, rows: List[Tuple[str, int, bool]]) -> int:
+        """Add many markets in a single transaction
+        
+        Args:
+            rows: (symbol, quantity, buy_all) tuples. Existing symbols are skipped.
+        Returns:
+            Number of markets added, -1 on error
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.executemany(f'''
+                    INSERT OR IGNORE INTO markets (symbol, quantity, buy_all, created_at, updated_at)
+                    VALUES (?, ?, ?, {_SQL_NOW}, {_SQL_NOW})
+                ''', [(symbol, quantity, 1 if buy_all else 0) for symbol, quantity, buy_all in rows])
+                logging.info(f"Markets added: {cursor.rowcount} of {len(rows)}")
+                return cursor.rowcount
+        except Exception as e:
+            logging.error(f"Bulk market addition error: {e}")
+            return -1
+    
     # ============ TRADES OPERATIONS ============
     
     def add_trade(self, symbol: str, side: str, quantity: float, price: float, 
@@ -302,26 +574,14 @@ class TradingDatabase:
         
         Args:
             trade_date: Optional. If not specified, current time is used.
-                        Format: 'YYYY-MM-DD' or ISO timestamp
+                        Format: full ISO timestamp (pass plain dates through normalize_date)
         """
         try:
+            trade_date = trade_date or datetime.now().isoformat()
+            
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                now = datetime.now().isoformat()
-                
-                # If no custom date is given, use current time
-                if trade_date is None:
-                    trade_date = now
-                # If only date is given (YYYY-MM-DD), convert to timestamp
-                elif len(trade_date) == 10:  # YYYY-MM-DD format
-                    trade_date = f"{trade_date}T00:00:00"
-                
-                cursor.execute('''
-                    INSERT INTO trades (symbol, side, quantity, price, value, order_id, 
-                                        status, is_dry_run, trade_date, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (symbol, side, quantity, price, value, order_id, status, 
-                      1 if is_dry_run else 0, trade_date, now))
+                cursor = conn.execute(_SQL_INSERT_TRADE, (symbol, side, quantity, price, value, order_id, status,
+                                                          1 if is_dry_run else 0, trade_date))
                 
                 trade_id = cursor.lastrowid
                 logging.info(f"Trade saved: {symbol} {side} {value} ({trade_date})")
@@ -330,13 +590,38 @@ class TradingDatabase:
             logging.error(f"Trade addition error: {e}")
             return -1
     
+    @staticmethod
+    def normalize_date(date: str) -> str:
+        """'YYYY-MM-DD' -> 'YYYY-MM-DDT00:00:00'; ISO timestamps are returned unchanged"""
+        if len(date) == 10:  # YYYY-MM-DD format
+            return f"{date}T00:00:00"
+        return date
+    
+    def bulk_add_trades(self, rows: List[Tuple]) -> int:
+        """Add many trades in a single transaction
+        
+        Args:
+            rows: (symbol, side, quantity, price, value, order_id, status,
+                   is_dry_run, trade_date) tuples, in table column order
+        Returns:
+            Number of trades added, -1 on error
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.executemany(_SQL_INSERT_TRADE, rows)
+                logging.info(f"Trades saved: {cursor.rowcount}")
+                return cursor.rowcount
+        except Exception as e:
+            logging.error(f"Bulk trade addition error: {e}")
+            return -1
+    
     def get_trades(self, symbol: str = None, limit: int = 100, 
                    include_dry_run: bool = False) -> List[Dict[str, Any]]:
         """Get trade history"""
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
             
-            query = 'SELECT * FROM trades WHERE 1=1'
+            query = f"SELECT {', '.join(_TRADE_KEYS)} FROM trades WHERE 1=1"
             params = []
             
             if symbol:
@@ -350,52 +635,42 @@ class TradingDatabase:
             params.append(limit)
             
             cursor.execute(query, params)
-            rows = cursor.fetchall()
             
-            return [{
-                'id': row['id'],
-                'symbol': row['symbol'],
-                'side': row['side'],
-                'quantity': row['quantity'],
-                'price': row['price'],
-                'value': row['value'],
-                'orderId': row['order_id'],
-                'status': row['status'],
-                'isDryRun': bool(row['is_dry_run']),
-                'date': row['trade_date']
-            } for row in rows]
+            keys = tuple(_TRADE_KEYS.values())
+            trades = []
+            for row in cursor:
+                trade = dict(zip(keys, row))
+                trade['isDryRun'] = bool(trade['isDryRun'])
+                trades.append(trade)
+            return trades
     
     def get_trade_stats(self, symbol: str = None) -> Dict[str, Any]:
         """Trade statistics"""
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
             
-            query = '''
-                SELECT 
-                    COUNT(*) as total_trades,
-                    SUM(CASE WHEN side = 'BUY' THEN 1 ELSE 0 END) as total_buys,
-                    SUM(CASE WHEN side = 'SELL' THEN 1 ELSE 0 END) as total_sells,
-                    SUM(CASE WHEN side = 'BUY' THEN value ELSE 0 END) as total_buy_value,
-                    SUM(CASE WHEN side = 'SELL' THEN value ELSE 0 END) as total_sell_value
-                FROM trades
-                WHERE is_dry_run = 0
-            '''
+            # One (count, value) row per side, grouped over idx_trades_side
+            query = 'SELECT side, COUNT(*), SUM(value) FROM trades WHERE is_dry_run = 0'
             
             params = []
             if symbol:
                 query += ' AND symbol = ?'
                 params.append(symbol)
+            query += ' GROUP BY side'
             
             cursor.execute(query, params)
-            row = cursor.fetchone()
+            by_side = {side: (count, value) for side, count, value in cursor}
+            
+            total_buys, total_buy_value = by_side.get('BUY', (0, 0))
+            total_sells, total_sell_value = by_side.get('SELL', (0, 0))
             
             return {
-                'totalTrades': row['total_trades'] or 0,
-                'totalBuys': row['total_buys'] or 0,
-                'totalSells': row['total_sells'] or 0,
-                'totalBuyValue': row['total_buy_value'] or 0,
-                'totalSellValue': row['total_sell_value'] or 0,
-                'netValue': (row['total_sell_value'] or 0) - (row['total_buy_value'] or 0)
+                'totalTrades': sum(count for count, _ in by_side.values()),
+                'totalBuys': total_buys,
+                'totalSells': total_sells,
+                'totalBuyValue': total_buy_value,
+                'totalSellValue': total_sell_value,
+                'netValue': total_sell_value - total_buy_value
             }
     
     # ============ PORTFOLIO OPERATIONS ============
@@ -405,47 +680,45 @@ class TradingDatabase:
         """Update portfolio status"""
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                now = datetime.now().isoformat()
                 total = free + locked
-                
-                cursor.execute('''
-                    INSERT INTO portfolio (asset, free, locked, total, usd_value, current_price, updated_at)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ON CONFLICT(asset) DO UPDATE SET
-                        free = excluded.free,
-                        locked = excluded.locked,
-                        total = excluded.total,
-                        usd_value = excluded.usd_value,
-                        current_price = excluded.current_price,
-                        updated_at = excluded.updated_at
-                ''', (asset, free, locked, total, usd_value, current_price, now))
+                conn.execute(_SQL_UPSERT_PORTFOLIO, (asset, free, locked, total, usd_value, current_price))
                 
                 return True
         except Exception as e:
             logging.error(f"Portfolio update error: {e}")
             return False
-    
+
+    def bulk_update_portfolio(self, rows: List[Tuple[str, float, float, float, float]]) -> int:
+        """Update many portfolio assets in a single transaction
+
+        Args:
+            rows: (asset, free, locked, current_price, usd_value) tuples, as for update_portfolio
+        Returns:
+            Number of assets updated, -1 on error
+        """
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.executemany(_SQL_UPSERT_PORTFOLIO, [
+                    (asset, free, locked, free + locked, usd_value, current_price)
+                    for asset, free, locked, current_price, usd_value in rows
+                ])
+                return cursor.rowcount
+        except Exception as e:
+            logging.error(f"Bulk portfolio update error: {e}")
+            return -1
+
     def get_portfolio(self) -> List[Dict[str, Any]]:
         """Get entire portfolio"""
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute('''
-                SELECT * FROM portfolio 
+            cursor.execute(f'''
+                SELECT {', '.join(_PORTFOLIO_KEYS)} FROM portfolio
                 WHERE total > 0 OR usd_value > 0.01
                 ORDER BY usd_value DESC
             ''')
-            rows = cursor.fetchall()
             
-            return [{
-                'asset': row['asset'],
-                'free': row['free'],
-                'locked': row['locked'],
-                'total': row['total'],
-                'usdValue': row['usd_value'],
-                'currentPrice': row['current_price'],
-                'updatedAt': row['updated_at']
-            } for row in rows]
+            keys = tuple(_PORTFOLIO_KEYS.values())
+            return [dict(zip(keys, row)) for row in cursor]
     
     def add_portfolio_snapshot(self, total_value: float, usdt_balance: float, 
                                crypto_value: float) -> int:
@@ -453,54 +726,51 @@ class TradingDatabase:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                now = datetime.now().isoformat()
                 today = datetime.now().strftime('%Y-%m-%d')
                 
-                # Check if a snapshot already exists for today
-                cursor.execute('''
-                    SELECT id FROM portfolio_history 
-                    WHERE snapshot_date = ?
-                ''', (today,))
+                # One snapshot per day: insert, or overwrite today's row
+                sql = f'''
+                    INSERT INTO portfolio_history (total_value, usdt_balance, crypto_value, snapshot_date, created_at)
+                    VALUES (?, ?, ?, ?, {_SQL_NOW})
+                    ON CONFLICT(snapshot_date) DO UPDATE SET
+                        total_value = excluded.total_value,
+                        usdt_balance = excluded.usdt_balance,
+                        crypto_value = excluded.crypto_value,
+                        created_at = excluded.created_at
+                '''
+                params = (total_value, usdt_balance, crypto_value, today)
                 
-                existing = cursor.fetchone()
+                if _SQLITE_HAS_RETURNING:
+                    cursor.execute(sql + ' RETURNING id', params)
+                    return cursor.fetchone()[0]
                 
-                if existing:
-                    # Update
-                    cursor.execute('''
-                        UPDATE portfolio_history 
-                        SET total_value = ?, usdt_balance = ?, crypto_value = ?, created_at = ?
-                        WHERE snapshot_date = ?
-                    ''', (total_value, usdt_balance, crypto_value, now, today))
-                    return existing['id']
-                else:
-                    # Add new
-                    cursor.execute('''
-                        INSERT INTO portfolio_history (total_value, usdt_balance, crypto_value, snapshot_date, created_at)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (total_value, usdt_balance, crypto_value, today, now))
-                    return cursor.lastrowid
+                cursor.execute(sql, params)
+                cursor.execute('SELECT id FROM portfolio_history WHERE snapshot_date = ?', (today,))
+                return cursor.fetchone()[0]
         except Exception as e:
             logging.error(f"Snapshot addition error: {e}")
             return -1
     
     def get_portfolio_history(self, days: int = 30) -> List[Dict[str, Any]]:
         """Portfolio value history"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_read_connection() as conn:
+            cursor = self._row_cursor(conn)
+            # Latest N days, returned in chronological order for charting
             cursor.execute('''
-                SELECT * FROM portfolio_history 
-                ORDER BY snapshot_date DESC 
-                LIMIT ?
+                SELECT * FROM (
+                    SELECT total_value, usdt_balance, crypto_value, snapshot_date
+                    FROM portfolio_history
+                    ORDER BY snapshot_date DESC
+                    LIMIT ?
+                ) ORDER BY snapshot_date ASC
             ''', (days,))
-            rows = cursor.fetchall()
             
-            # Return in chronological order for charting
             return [{
                 'value': row['total_value'],
                 'usdtBalance': row['usdt_balance'],
                 'cryptoValue': row['crypto_value'],
                 'date': row['snapshot_date']
-            } for row in reversed(rows)]
+            } for row in cursor]
     
     # ============ SIGNALS OPERATIONS ============
     
@@ -509,13 +779,8 @@ class TradingDatabase:
         """Add a new signal"""
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                now = datetime.now().isoformat()
-                cursor.execute('''
-                    INSERT INTO signals (symbol, signal_type, direction, signal_price, 
-                                         current_price, supertrend_value, is_processed, created_at)
-                    VALUES (?, ?, ?, ?, ?, ?, 0, ?)
-                ''', (symbol, signal_type, direction, signal_price, current_price, supertrend_value, now))
+                cursor = conn.execute(_SQL_INSERT_SIGNAL, (symbol, signal_type, direction, signal_price,
+                                                           current_price, supertrend_value))
                 return cursor.lastrowid
         except Exception as e:
             logging.error(f"Signal addition error: {e}")
@@ -525,8 +790,7 @@ class TradingDatabase:
         """Mark signal as processed"""
         try:
             with self.get_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('UPDATE signals SET is_processed = 1 WHERE id = ?', (signal_id,))
+                cursor = conn.execute(_SQL_MARK_SIGNAL_PROCESSED, (signal_id,))
                 return cursor.rowcount > 0
         except Exception as e:
             logging.error(f"Signal update error: {e}")
@@ -539,14 +803,11 @@ class TradingDatabase:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                now = datetime.now().isoformat()
-                cursor.execute('''
-                    INSERT INTO api_keys (api_key, description, created_at)
-                    VALUES (?, ?, ?)
-                ''', (api_key, description, now))
-                return True
-        except sqlite3.IntegrityError:
-            return False
+                cursor.execute(f'''
+                    INSERT OR IGNORE INTO api_keys (api_key, description, created_at)
+                    VALUES (?, ?, {_SQL_NOW})
+                ''', (api_key, description))
+                return cursor.rowcount > 0
         except Exception as e:
             logging.error(f"API key addition error: {e}")
             return False
@@ -554,36 +815,32 @@ class TradingDatabase:
     def verify_api_key(self, api_key: str) -> bool:
         """Verify API key"""
         with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT id FROM api_keys 
+            # Stamp the last used time; a matched row means the key is valid and active
+            cursor = conn.execute(f'''
+                UPDATE api_keys SET last_used_at = {_SQL_NOW}
                 WHERE api_key = ? AND is_active = 1
             ''', (api_key,))
-            
-            row = cursor.fetchone()
-            if row:
-                # Update last used time
-                cursor.execute('''
-                    UPDATE api_keys SET last_used_at = ? WHERE id = ?
-                ''', (datetime.now().isoformat(), row['id']))
-                return True
-            return False
+            return cursor.rowcount > 0
     
     def get_api_keys(self) -> List[Dict[str, Any]]:
         """Get all API keys"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute('SELECT * FROM api_keys ORDER BY created_at DESC')
-            rows = cursor.fetchall()
+        with self.get_read_connection() as conn:
+            cursor = self._row_cursor(conn)
+            # Keys are masked in SQL so the full secret never reaches Python (for security)
+            cursor.execute('''
+                SELECT id, substr(api_key, 1, 10) || '...' AS masked_key, description,
+                       is_active, created_at, last_used_at
+                FROM api_keys ORDER BY created_at DESC
+            ''')
             
             return [{
                 'id': row['id'],
-                'apiKey': row['api_key'][:10] + '...',  # For security
+                'apiKey': row['masked_key'],
                 'description': row['description'],
                 'isActive': bool(row['is_active']),
                 'createdAt': row['created_at'],
                 'lastUsedAt': row['last_used_at']
-            } for row in rows]
+            } for row in cursor]
     
     # ============ CONFIG OPERATIONS ============
     
@@ -592,44 +849,63 @@ class TradingDatabase:
         try:
             with self.get_connection() as conn:
                 cursor = conn.cursor()
-                now = datetime.now().isoformat()
                 value_str = json.dumps(value) if not isinstance(value, str) else value
                 
-                cursor.execute('''
+                cursor.execute(f'''
                     INSERT INTO bot_config (key, value, description, updated_at)
-                    VALUES (?, ?, ?, ?)
+                    VALUES (?, ?, ?, {_SQL_NOW})
                     ON CONFLICT(key) DO UPDATE SET
                         value = excluded.value,
                         description = excluded.description,
                         updated_at = excluded.updated_at
-                ''', (key, value_str, description, now))
-                return True
+                ''', (key, value_str, description))
+            
+            if self._conn.in_transaction:
+                # Joined an outer transaction that may still roll back: drop the entry instead,
+                # the next get_config after the commit reloads it
+                self._config_cache.pop(key, None)
+            else:
+                # Committed: cache what get_config would decode from the stored text
+                self._config_cache[key] = self._decode_config(value_str)
+            return True
         except Exception as e:
             logging.error(f"Config save error: {e}")
             return False
     
     def get_config(self, key: str, default: Any = None) -> Any:
         """Get config value"""
-        with self.get_connection() as conn:
+        if key in self._config_cache:
+            return self._config_cache[key]
+        
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT value FROM bot_config WHERE key = ?', (key,))
             row = cursor.fetchone()
             
             if row:
-                try:
-                    # Try to parse as JSON first
-                    return json.loads(row['value'])
-                except:
-                    # Fallback to plain string
-                    return row['value']
+                value = self._decode_config(row[0])
+                # A read inside an open transaction may see uncommitted writes, so it is not cached
+                if not self._conn.in_transaction:
+                    self._config_cache[key] = value
+                return value
             return default
     
+    @staticmethod
+    def _decode_config(value_str: str) -> Any:
+        """Stored config text -> value"""
+        try:
+            # Try to parse as JSON first
+            return json.loads(value_str)
+        except (json.JSONDecodeError, TypeError):
+            # Fallback to plain string
+            return value_str
+    
     # ============ HELPER FUNCTIONS ============
     
     def get_stats(self) -> Dict[str, Any]:
         """General statistics"""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+        with self.get_read_connection() as conn:
+            cursor = self._row_cursor(conn)
             
             # Market count
             cursor.execute('SELECT COUNT(*) as count FROM markets WHERE is_active = 1')
@@ -654,35 +930,32 @@ class TradingDatabase:
         """Migrate data from old file-based system (migration)"""
         logging.info("Starting migration from file-based system...")
         
-        # Markets migration
+        # Markets migration: SYMBOL-QUANTITY[-BUYALL] per line
         try:
-            with open(markets_file, 'r') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and '-' in line:
-                        parts = line.split('-')
-                        symbol = parts[0]
-                        quantity = int(parts[1]) if len(parts) > 1 else 0
-                        buy_all = parts[2].strip() == '1' if len(parts) > 2 else False
-                        self.add_market(symbol, quantity, buy_all)
+            lines = Path(markets_file).read_text().splitlines()
+            markets = [
+                (parts[0],
+                 int(parts[1]) if len(parts) > 1 else 0,
+                 parts[2].strip() == '1' if len(parts) > 2 else False)
+                for parts in (line.strip().split('-') for line in lines if '-' in line)
+            ]
+            self.bulk_add_markets(markets)
             logging.info("Markets migration complete")
         except Exception as e:
             logging.error(f"Markets migration error: {e}")
         
-        # History migration
+        # History migration: SYMBOL;SIDE:VALUE;DATE per line
         try:
-            with open(history_file, 'r') as f:
-                for line in f:
-                    parts = line.strip().split(';')
-                    if len(parts) >= 3:
-                        symbol = parts[0]
-                        side_value = parts[1].split(':')
-                        side = side_value[0]
-                        value = float(side_value[1])
-                        date = parts[2].split(':')[1] if ':' in parts[2] else parts[2]
-                        
-                        # Approximate price (since value/quantity is unknown)
-                        self.add_trade(symbol, side, 0, 0, value, None, 'FILLED_MIGRATED', False)
+            now = datetime.now().isoformat()
+            lines = Path(history_file).read_text().splitlines()
+            # Approximate price (since value/quantity is unknown)
+            trades = [
+                (parts[0], parts[1].split(':')[0], 0, 0, float(parts[1].split(':')[1]),
+                 None, 'FILLED_MIGRATED', 0, now)
+                for parts in (line.strip().split(';') for line in lines)
+                if len(parts) >= 3
+            ]
+            self.bulk_add_trades(trades)
             logging.info("History migration complete")
         except Exception as e:
             logging.error(f"History migration error: {e}")
@@ -0,0 +1,82 @@
+import statistics
+
+import numpy as np
+import pytest
+
+import AlmaTrend
+
+# Falling closes that end in a flat run: with sd_period=2 the last windows are constant (sd == 0)
+FLAT_CLOSES = [100, 101, 99, 98, 97, 96, 95, 94, 93, 92, 91, 92, 93, 94, 95, 94, 93, 92, 91, 90, 90, 90, 87]
+BOT_PARAMS = (20, 5, 0.85, 6, 1.8)  # sd_period, alma_period, alma_offset, alma_sigma, factor
+
+
+def exact_stdev(series, length):
+    """ta.stdev reference: exact sample stdev per window (statistics uses fractions internally)"""
+    sd = np.full(len(series), np.nan)
+    for i in range(length - 1, len(series)):
+        sd[i] = statistics.stdev(series[i - length + 1:i + 1].tolist())
+    return sd
+
+
+def reference_supertrend(close, sd_period, alma_period, alma_offset, alma_sigma, factor):
+    out = np.empty(len(close))
+    alma = AlmaTrend.pine_alma(close, alma_period, alma_offset, alma_sigma)
+    start = max(alma_period, sd_period) - 1
+    AlmaTrend._supertrend_core(close, alma, exact_stdev(close, sd_period), factor, start, out)
+    return out
+
+
+def random_walks_with_flat_runs(count=20, bars=300, seed=7):
+    rng = np.random.default_rng(seed)
+    for _ in range(count):
+        close = np.round(100 + np.cumsum(rng.normal(0, 1, bars)), 2)
+        k = rng.integers(50, bars - 60)
+        close[k:k + rng.integers(20, 40)] = close[k]
+        yield close
+
+
+@pytest.fixture(params=["numba", "bottleneck", "numpy"])
+def stdev_path(request, monkeypatch):
+    """Run generateSupertrend/rolling_stdev through each stdev implementation"""
+    if request.param == "numba":
+        if not AlmaTrend._HAS_NUMBA:
+            pytest.skip("numba not installed")
+    else:
+        monkeypatch.setattr(AlmaTrend, "_HAS_NUMBA", False)
+    if request.param == "bottleneck" and AlmaTrend.bn is None:
+        pytest.skip("bottleneck not installed")
+    if request.param == "numpy":
+        monkeypatch.setattr(AlmaTrend, "bn", None)
+    return request.param
+
+
+def test_rolling_stdev_is_zero_on_constant_windows(stdev_path):
+    close = np.array(FLAT_CLOSES, dtype=float)
+    sd = AlmaTrend.rolling_stdev(close, 2)
+    assert sd[20] == 0.0 and sd[21] == 0.0
+    np.testing.assert_allclose(sd, exact_stdev(close, 2), rtol=1e-9)
+
+
+def test_rolling_stdev_float32_accumulates_in_float64(stdev_path):
+    rng = np.random.default_rng(3)
+    close = (60000 + np.cumsum(rng.normal(0, 50, 5000))).astype(np.float32)
+    sd = AlmaTrend.rolling_stdev(close, 20)
+    assert sd.dtype == np.float32
+    np.testing.assert_allclose(sd, exact_stdev(close.astype(float), 20), rtol=1e-5)
+
+
+def test_flat_run_matches_reference(stdev_path):
+    close = np.array(FLAT_CLOSES, dtype=float)
+    supertrend = AlmaTrend.generateSupertrend(close, close, close, 2, 3, 0.85, 6, 1.8)
+    assert supertrend[22] == pytest.approx(90.0)
+
+    for close in random_walks_with_flat_runs():
+        supertrend = AlmaTrend.generateSupertrend(close, close, close, *BOT_PARAMS)
+        np.testing.assert_allclose(supertrend, reference_supertrend(close, *BOT_PARAMS), rtol=1e-9)
+
+
+def test_supertrend_state_matches_reference_on_flat_runs():
+    for close in random_walks_with_flat_runs(count=5):
+        state = AlmaTrend.SupertrendState(*BOT_PARAMS)
+        incremental = np.array([state.update(c) for c in close])
+        np.testing.assert_allclose(incremental, reference_supertrend(close, *BOT_PARAMS), rtol=1e-9)
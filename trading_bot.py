@@ -14,18 +14,19 @@ import sys
 import time
 import asyncio
 from datetime import datetime, timezone
+from decimal import Decimal
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 import numpy as np
 import telegram
-from binance.client import Client
+from binance import AsyncClient, Client
 from binance.exceptions import BinanceAPIException
 
 # Local modules
 try:
     import AlmaTrend
-    from database import TradingDatabase
+    from database import MarketRow, TradingDatabase
 except ImportError as e:
     print(f"Error: Required module not found: {e}")
     print("Please ensure 'AlmaTrend.py' and 'database.py' files are present.")
@@ -58,6 +59,13 @@ class Config:
     KLINES_LIMIT = 750
     MIN_KLINES_REQUIRED = 100
     
+    # Concurrency
+    MAX_CONCURRENT_SYMBOLS = 4  # Symbols processed at the same time
+    
+    # Binance rate limit: request weight allowed per period (10% under the 1200/minute limit)
+    API_WEIGHT_LIMIT = 1100
+    API_WEIGHT_PERIOD = 60  # seconds
+    
     # ALMA Supertrend Parameters
     ALMA_FACTOR = 1.8
     ALMA_SD_LEN = 20
@@ -75,6 +83,25 @@ class Config:
     SEPARATOR = "-" * 50
 
 
+# Trend saved to the markets table for each AlmaTrend.classify state (anything else is NEUTRAL)
+TREND_BY_STATE = {
+    AlmaTrend.LONG_CROSS: "BULL",
+    AlmaTrend.BULL: "BULL",
+    AlmaTrend.SHORT_CROSS: "BEAR",
+    AlmaTrend.BEAR: "BEAR",
+}
+
+# Binance request weight of each endpoint used by BinanceService
+API_WEIGHTS = {
+    'klines': 2,
+    'ticker': 2,
+    'all_tickers': 4,
+    'account': 20,
+    'exchange_info': 20,
+    'order': 1,
+}
+
+
 # --- Helper Functions ---
 
 def setup_logging():
@@ -99,80 +126,196 @@ def read_file_lines(filepath: Path) -> List[str]:
         logging.error(f"File not found: {filepath}")
         return []
 
-def round_quantity(quantity: float, step_size: float) -> float:
-    """Round quantity according to Binance LOT_SIZE filter"""
+def step_precision(step_size: str) -> int:
+    """Decimal places of a LOT_SIZE stepSize string ('0.00100000' -> 3, '1.00000000' -> 0)"""
+    return max(0, -Decimal(step_size).normalize().as_tuple().exponent)
+
+def step_tick_exp(step_size: str) -> Optional[int]:
+    """Exponent of a power-of-ten stepSize ('0.00100000' -> -3, '1.00000000' -> 0), None for other steps"""
+    step = Decimal(step_size).normalize()
+    if step.as_tuple().digits != (1,):
+        return None
+    return step.adjusted()
+
+def lot_factor(step_size: float, tick_exp: Optional[int] = None) -> float:
+    """Steps per unit of quantity: exact integer for power-of-ten steps below 1, 1 / step_size otherwise"""
+    if tick_exp is not None and tick_exp < 0:
+        return 10 ** -tick_exp
+    return 1 / step_size
+
+def round_quantity(quantity: float, step_size: float, precision: int, tick_exp: Optional[int] = None) -> float:
+    """Round quantity according to Binance LOT_SIZE filter (precision from step_precision)
+    
+    tick_exp (from step_tick_exp) selects the power-of-ten fast path, where the factor is exact.
+    """
+    if tick_exp is not None and tick_exp >= 0:
+        return quantity // step_size * step_size
+    
     if step_size <= 0:
         return quantity
     
-    precision = abs(int(round(math.log10(step_size)))) if step_size < 1 else 0
-    factor = 1 / step_size
+    factor = lot_factor(step_size, tick_exp)
     floored_quantity = math.floor(quantity * factor) / factor
+    if tick_exp is not None:
+        return floored_quantity
     
     return round(floored_quantity, precision)
 
 
+class WeightLimiter:
+    """Token bucket over Binance request weight, shared by all concurrent API calls"""
+    def __init__(self, max_weight: float, period: float):
+        self.capacity = max_weight
+        self.rate = max_weight / period  # weight refilled per second
+        self._tokens = max_weight
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, weight: float = 1):
+        """Wait until `weight` is available and spend it (waiters are served in order)"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= weight:
+                    self._tokens -= weight
+                    return
+                await asyncio.sleep((weight - self._tokens) / self.rate)
+
+
 # --- Service Classes ---
 
 class BinanceService:
-    """Binance API management"""
-    def __init__(self, api_key: str, api_secret: str, dry_run: bool = True):
-        self.client = Client(api_key, api_secret)
+    """Binance API management (one AsyncClient, so every request reuses the same keep-alive session)"""
+    def __init__(self, client: AsyncClient, dry_run: bool = True):
+        self.client = client
+        self._limiter = WeightLimiter(Config.API_WEIGHT_LIMIT, Config.API_WEIGHT_PERIOD)
         self.symbol_info_cache: Dict[str, Any] = {}
+        self._filters: Dict[str, Dict[str, Dict[str, Any]]] = {}  # symbol -> filterType -> filter
+        self._lot_sizes: Dict[str, tuple] = {}  # symbol -> (step_size, precision, tick_exp)
+        # Snapshots filled by prefetch_snapshot(); None means "not loaded, ask the API"
+        self._price_map: Optional[Dict[str, float]] = None
+        self._balance_map: Optional[Dict[str, tuple]] = None
         self.dry_run = dry_run
         mode = "DRY RUN (TEST MODE)" if self.dry_run else "LIVE (REAL MODE)"
         logging.info(f"Binance initialized. MODE: {mode}")
 
+    @classmethod
+    async def create(cls, api_key: str, api_secret: str, dry_run: bool = True) -> 'BinanceService':
+        client = await AsyncClient.create(api_key, api_secret)
+        return cls(client, dry_run=dry_run)
+
     @staticmethod
-    def from_file(filepath: Path, dry_run: bool) -> Optional['BinanceService']:
+    async def from_file(filepath: Path, dry_run: bool) -> Optional['BinanceService']:
         lines = read_file_lines(filepath)
         if len(lines) < 4:
             logging.error(f"Credentials missing: {filepath}")
             return None
-        return BinanceService(api_key=lines[1], api_secret=lines[3], dry_run=dry_run)
+        return await BinanceService.create(api_key=lines[1], api_secret=lines[3], dry_run=dry_run)
+
+    async def close(self):
+        await self.client.close_connection()
 
-    def get_klines(self, symbol: str) -> List[Any]:
-        return self.client.get_klines(
+    async def prefetch_snapshot(self):
+        """Load every price and balance with one call each, instead of one call per symbol/asset"""
+        await self.preload_exchange_info()
+        try:
+            await self._limiter.acquire(API_WEIGHTS['all_tickers'])
+            self._price_map = {t['symbol']: float(t['price']) for t in await self.client.get_all_tickers()}
+        except Exception as e:
+            logging.error(f"Price snapshot error: {e}")
+        await self.refresh_balances()
+
+    async def preload_exchange_info(self):
+        """Fill symbol_info_cache for all symbols from a single exchangeInfo request"""
+        try:
+            await self._limiter.acquire(API_WEIGHTS['exchange_info'])
+            info = await self.client.get_exchange_info()
+        except Exception as e:
+            logging.error(f"Exchange info error: {e}")
+            return
+        for symbol_info in info['symbols']:
+            self._cache_symbol_info(symbol_info['symbol'], symbol_info)
+
+    def _cache_symbol_info(self, symbol: str, info: Optional[Dict[str, Any]]):
+        self.symbol_info_cache[symbol] = info
+        if info:
+            self._filters[symbol] = {f['filterType']: f for f in info['filters']}
+
+    async def refresh_balances(self):
+        """Reload the balance snapshot (after an order has changed the balances)"""
+        try:
+            await self._limiter.acquire(API_WEIGHTS['account'])
+            account = await self.client.get_account()
+            self._balance_map = {
+                b['asset']: (float(b['free']), float(b['locked'])) for b in account['balances']
+            }
+        except Exception as e:
+            logging.error(f"Balance snapshot error: {e}")
+            self._balance_map = None
+
+    async def get_klines(self, symbol: str) -> List[Any]:
+        await self._limiter.acquire(API_WEIGHTS['klines'])
+        return await self.client.get_klines(
             symbol=symbol,
             interval=Config.KLINES_INTERVAL,
             limit=Config.KLINES_LIMIT
         )
 
-    def get_current_price(self, symbol: str) -> Optional[float]:
+    async def get_current_price(self, symbol: str) -> Optional[float]:
+        if self._price_map is not None and symbol in self._price_map:
+            return self._price_map[symbol]
         try:
-            ticker = self.client.get_symbol_ticker(symbol=symbol)
+            await self._limiter.acquire(API_WEIGHTS['ticker'])
+            ticker = await self.client.get_symbol_ticker(symbol=symbol)
             return float(ticker['price'])
         except Exception as e:
             logging.error(f"{symbol} price error: {e}")
             return None
 
-    def get_symbol_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+    async def get_symbol_info(self, symbol: str) -> Optional[Dict[str, Any]]:
         if symbol not in self.symbol_info_cache:
             try:
-                self.symbol_info_cache[symbol] = self.client.get_symbol_info(symbol)
+                await self._limiter.acquire(API_WEIGHTS['exchange_info'])
+                self._cache_symbol_info(symbol, await self.client.get_symbol_info(symbol))
             except Exception as e:
                 logging.error(f"{symbol} symbol info error: {e}")
                 return None
         return self.symbol_info_cache[symbol]
 
-    def get_filter_value(self, symbol: str, filter_type: str, key: str) -> Optional[float]:
-        info = self.get_symbol_info(symbol)
-        if not info:
+    async def get_filter_value(self, symbol: str, filter_type: str, key: str) -> Optional[float]:
+        if symbol not in self._filters and not await self.get_symbol_info(symbol):
             return None
-        for f in info['filters']:
-            if f['filterType'] == filter_type:
-                return float(f[key])
-        return None
+        f = self._filters[symbol].get(filter_type)
+        return float(f[key]) if f else None
+
+    async def get_lot_size(self, symbol: str) -> Optional[tuple]:
+        """Return the LOT_SIZE (step_size, precision, tick_exp) for round_quantity, computed once per symbol"""
+        if symbol not in self._lot_sizes:
+            if symbol not in self._filters and not await self.get_symbol_info(symbol):
+                return None
+            lot_filter = self._filters[symbol].get('LOT_SIZE')
+            if not lot_filter:
+                return None
+            step = lot_filter['stepSize']
+            self._lot_sizes[symbol] = (float(step), step_precision(step), step_tick_exp(step))
+        return self._lot_sizes[symbol]
 
-    def get_asset_balance(self, asset: str) -> tuple:
+    async def get_asset_balance(self, asset: str) -> tuple:
         """Return asset balance (free, locked)"""
+        if self._balance_map is not None:
+            return self._balance_map.get(asset, (0.0, 0.0))
         try:
-            balance = self.client.get_asset_balance(asset=asset)
+            # get_asset_balance reads the account endpoint
+            await self._limiter.acquire(API_WEIGHTS['account'])
+            balance = await self.client.get_asset_balance(asset=asset)
             return float(balance['free']), float(balance['locked'])
         except Exception as e:
             logging.error(f"{asset} balance error: {e}")
             return 0.0, 0.0
 
-    def place_market_order(self, side: str, symbol: str, quantity: float) -> Optional[Dict[str, Any]]:
+    async def place_market_order(self, side: str, symbol: str, quantity: float) -> Optional[Dict[str, Any]]:
         if self.dry_run:
             logging.info(f"[DRY RUN] SIMULATED: {side} {quantity} {symbol}")
             return {
@@ -186,13 +329,15 @@ class BinanceService:
             
         try:
             logging.info(f"ORDER: {side} {quantity} {symbol}")
+            await self._limiter.acquire(API_WEIGHTS['order'])
             if side == Client.SIDE_BUY:
-                order = self.client.order_market_buy(symbol=symbol, quantity=quantity)
+                order = await self.client.order_market_buy(symbol=symbol, quantity=quantity)
             elif side == Client.SIDE_SELL:
-                order = self.client.order_market_sell(symbol=symbol, quantity=quantity)
+                order = await self.client.order_market_sell(symbol=symbol, quantity=quantity)
             else:
                 raise ValueError("Invalid side")
             logging.info(f"ORDER SUCCESSFUL: {order}")
+            await self.refresh_balances()
             return order
         except Exception as e:
             logging.error(f"{symbol} order error: {e}")
@@ -249,13 +394,24 @@ class TradingBot:
         self.traded_value_adjustment = 0.0
         self.dry_run = binance.dry_run
         self.trade_prefix = "[DRY RUN] " if self.dry_run else ""
+        # BTC trend emoji for Config.BTC_TREND_FILE, written once in finalize_report
+        self._btc_trend: Optional[str] = None
+        # Kline buffers reused by every symbol (KLINES_LIMIT is the most Binance returns)
+        self._close_buf = np.empty(Config.KLINES_LIMIT, dtype=np.float64)
+        self._supertrend_buf = np.empty(Config.KLINES_LIMIT, dtype=np.float64)
+        # Orders are placed one at a time: each handler reads a balance and spends it
+        self._order_lock = asyncio.Lock()
+        # Portfolio rows (asset, free, locked, price, usd_value), written together in finalize_report
+        self._portfolio_rows: List[tuple] = []
+        # USDT balance, read once in run() and adjusted locally after each fill
+        self._usdt_free = 0.0
 
     async def run(self):
         """Main bot loop"""
         logging.info("Trading bot starting (SQLite)...")
         
         # Get active markets from Database
-        markets = self.db.get_markets(active_only=True)
+        markets = self.db.get_market_rows(active_only=True)
         
         if not markets:
             logging.warning("No active markets to process!")
@@ -263,132 +419,141 @@ class TradingBot:
 
         logging.info(f"{len(markets)} markets will be processed")
 
-        for i, market in enumerate(markets):
-            logging.info(f"[{i+1}/{len(markets)}] Processing: {market['symbol']}")
-            await self.process_symbol(market)
-            await asyncio.sleep(1.5)
+        # All prices and balances in two requests; lookups below read from this snapshot
+        await self.binance.prefetch_snapshot()
+        self._usdt_free, _ = await self.binance.get_asset_balance('USDT')
+
+        # Symbols are I/O bound (Binance REST calls), so run several at once
+        semaphore = asyncio.Semaphore(Config.MAX_CONCURRENT_SYMBOLS)
+        await asyncio.gather(*(
+            self._process_with_limit(semaphore, market, f"[{i+1}/{len(markets)}]")
+            for i, market in enumerate(markets)
+        ))
 
         await self.finalize_report()
         logging.info("Trading bot loop completed")
 
-    async def process_symbol(self, market: Dict[str, Any]):
+    async def _process_with_limit(self, semaphore: asyncio.Semaphore, market: MarketRow, progress: str):
+        """Process a symbol once a worker slot is free"""
+        async with semaphore:
+            logging.info(f"{progress} Processing: {market.symbol}")
+            await self.process_symbol(market)
+
+    async def process_symbol(self, market: MarketRow):
         """Process a single symbol"""
-        symbol = market['symbol']
-        main_quantity = market['quantity']
-        buy_all_if_insufficient = market['buyAll']
+        symbol, main_quantity, buy_all_if_insufficient = market
         
         try:
             # Get klines data
-            klines = self.binance.get_klines(symbol)
+            klines = await self.binance.get_klines(symbol)
             if len(klines) < Config.MIN_KLINES_REQUIRED:
                 logging.warning(f"{symbol} insufficient klines: {len(klines)}")
                 return
 
-            # Price data
-            close = np.array([float(k[4]) for k in klines])
-            high = np.array([float(k[2]) for k in klines])
-            low = np.array([float(k[3]) for k in klines])
-
             # Current price
-            current_price = self.binance.get_current_price(symbol)
+            current_price = await self.binance.get_current_price(symbol)
             if not current_price:
                 logging.error(f"{symbol} could not get current price")
                 return
             
-            # Update portfolio
-            await self._update_portfolio_value(symbol, current_price)
+            # Portfolio value (saved to the database in finalize_report)
+            asset = symbol.replace("USDT", "")
+            free, locked = await self.binance.get_asset_balance(asset)
+            usdt_value = (free + locked) * current_price
+            self.total_crypto_value += usdt_value
+            self._portfolio_rows.append((asset, free, locked, current_price, usdt_value))
+
+            # From here until the scalars are extracted there must be no await: the close and
+            # supertrend arrays are views of buffers shared by all symbols.
+            # Price data: only the close column is parsed (numpy converts the price strings);
+            # the ALMA Supertrend does not use high/low
+            n = len(klines)
+            close = self._close_buf[:n]
+            close[:] = [k[4] for k in klines]
 
             # Calculate Supertrend
             supertrend_values = AlmaTrend.generateSupertrend(
-                close, high, low,
+                close, None, None,
                 Config.ALMA_SD_LEN, Config.ALMA_LEN, Config.ALMA_OFFSET, 
-                Config.ALMA_SIGMA, Config.ALMA_FACTOR
+                Config.ALMA_SIGMA, Config.ALMA_FACTOR,
+                out=self._supertrend_buf[:n]
             )
 
+            # Signal detection on the last closed bar ([-1] is the bar still forming);
+            # its state only depends on the last three bars
+            state = int(AlmaTrend.classify(supertrend_values[-3:], close[-3:])[-2])
             prev_supertrend = float(supertrend_values[-2])
-            prev_prev_supertrend = float(supertrend_values[-3])
-            prev_close = close[-2]
-            prev_prev_close = close[-3]
-
-            # Signal detection
-            is_long_cross = prev_prev_supertrend > prev_prev_close and prev_supertrend < prev_close
-            is_short_cross = prev_prev_supertrend < prev_prev_close and prev_supertrend > prev_close
-            is_bull_trend = prev_supertrend < prev_close and prev_prev_supertrend < prev_prev_close
-            is_bear_trend = prev_supertrend > prev_close and prev_prev_supertrend > prev_close
+            # Distance of the live price from the supertrend, for the BULL/BEAR log lines
+            pct = 100.0 * (float(close[-1]) / float(supertrend_values[-1]) - 1.0)
 
             # Determine current trend and save to database
-            current_trend = "NEUTRAL" # Default
-            if is_long_cross or is_bull_trend:
-                current_trend = "BULL"
-            elif is_short_cross or is_bear_trend:
-                current_trend = "BEAR"
-
-            try:
-                # database.py now supports the 'trend' argument
-                self.db.update_market(symbol, trend=current_trend)
-                logging.info(f"{symbol} trend updated: {current_trend}")
-            except Exception as e:
+            current_trend = TREND_BY_STATE.get(state, "NEUTRAL")
+
+            # Trend and signal are committed together. Nothing inside may await: the other
+            # symbols run on the same thread and their writes would join this transaction.
+            signal_id = -1
+            trend_error = None
+            with self.db.transaction():
+                try:
+                    # database.py now supports the 'trend' argument
+                    self.db.update_market(symbol, trend=current_trend)
+                    logging.info(f"{symbol} trend updated: {current_trend}")
+                except Exception as e:
+                    trend_error = e
+                
+                if state == AlmaTrend.LONG_CROSS:
+                    signal_id = self.db.add_signal(symbol, 'LONG_CROSS', 'BUY',
+                                                  prev_supertrend, current_price, prev_supertrend)
+                elif state == AlmaTrend.SHORT_CROSS:
+                    signal_id = self.db.add_signal(symbol, 'SHORT_CROSS', 'SELL',
+                                                  prev_supertrend, current_price, prev_supertrend)
+
+            if trend_error is not None:
                 # Log if an unexpected error occurs
-                logging.warning(f"{symbol} trend could not be updated: {e}")
-                await self.telegram.send_error(f"Could not update trend for '{symbol}'. Error: {e}", symbol=symbol)
+                logging.warning(f"{symbol} trend could not be updated: {trend_error}")
+                await self.telegram.send_error(f"Could not update trend for '{symbol}'. Error: {trend_error}", symbol=symbol)
 
-            if is_long_cross:
+            if state == AlmaTrend.LONG_CROSS:
                 # LONG signal - BUY
-                signal_id = self.db.add_signal(symbol, 'LONG_CROSS', 'BUY', 
-                                              prev_supertrend, current_price, prev_supertrend)
-                await self._handle_long_cross(symbol, main_quantity, buy_all_if_insufficient, current_price)
+                async with self._order_lock:
+                    await self._handle_long_cross(symbol, main_quantity, buy_all_if_insufficient, current_price)
                 if signal_id > 0:
                     self.db.mark_signal_processed(signal_id)
                     
                 if symbol == 'BTCUSDT':
-                    with open(Config.BTC_TREND_FILE, 'w') as f:
-                        f.write(Config.BULL_EMOJI)
+                    self._btc_trend = Config.BULL_EMOJI
                         
-            elif is_short_cross:
+            elif state == AlmaTrend.SHORT_CROSS:
                 # SHORT signal - SELL
-                signal_id = self.db.add_signal(symbol, 'SHORT_CROSS', 'SELL',
-                                              prev_supertrend, current_price, prev_supertrend)
-                await self._handle_short_cross(symbol, current_price)
+                async with self._order_lock:
+                    await self._handle_short_cross(symbol, current_price, free)
                 if signal_id > 0:
                     self.db.mark_signal_processed(signal_id)
                     
                 if symbol == 'BTCUSDT':
-                    with open(Config.BTC_TREND_FILE, 'w') as f:
-                        f.write(Config.BEAR_EMOJI)
+                    self._btc_trend = Config.BEAR_EMOJI
                         
-            elif is_bull_trend:
-                logging.info(f"{symbol}: BULL trend - waiting for SHORT %{100*(close[-1]/supertrend_values[-1] - 1):.2f}")
+            elif state == AlmaTrend.BULL:
+                logging.info("%s: BULL trend - waiting for SHORT %%%.2f", symbol, pct)
                 if symbol == 'BTCUSDT':
-                    with open(Config.BTC_TREND_FILE, 'w') as f:
-                        f.write(Config.BULL_EMOJI)
+                    self._btc_trend = Config.BULL_EMOJI
                         
-            elif is_bear_trend:
-                logging.info(f"{symbol}: BEAR trend - waiting for LONG %{100*(close[-1]/supertrend_values[-1] - 1):.2f}")
+            elif state == AlmaTrend.BEAR:
+                logging.info("%s: BEAR trend - waiting for LONG %%%.2f", symbol, pct)
                 if symbol == 'BTCUSDT':
-                    with open(Config.BTC_TREND_FILE, 'w') as f:
-                        f.write(Config.BEAR_EMOJI)
+                    self._btc_trend = Config.BEAR_EMOJI
 
         except Exception as e:
-            error_line = sys.exc_info()[-1].tb_lineno
-            logging.error(f"{symbol} processing error (line {error_line}): {e}")
+            tb = e.__traceback__
+            error_line = tb.tb_lineno if tb else -1
+            logging.error(f"{symbol} processing error (line {error_line}): {e}", exc_info=True)
             await self.telegram.send_error(f"Error: {e}\nLine: {error_line}", symbol=symbol)
 
-    async def _update_portfolio_value(self, symbol: str, current_price: float):
-        """Save portfolio value to database"""
-        asset = symbol.replace("USDT", "")
-        free, locked = self.binance.get_asset_balance(asset)
-        usdt_value = (free + locked) * current_price
-        self.total_crypto_value += usdt_value
-        
-        # Save to Database
-        self.db.update_portfolio(asset, free, locked, current_price, usdt_value)
-
     async def _handle_long_cross(self, symbol: str, main_quantity: int, buy_all: bool, price: float):
         """LONG CROSS - Buy operation"""
         logging.info(f"{symbol} LONG CROSS - Buy signal (Price: {price})")
         
-        usdt_free, usdt_locked = self.binance.get_asset_balance('USDT')
-        usdt_balance = usdt_free
+        usdt_balance = self._usdt_free
         quantity_to_buy_usdt = 0
         
         if usdt_balance >= main_quantity and main_quantity > 0:
@@ -399,16 +564,18 @@ class TradingBot:
             await self.telegram.send_message(msg)
         
         if quantity_to_buy_usdt > 0:
-            step_size = self.binance.get_filter_value(symbol, 'LOT_SIZE', 'stepSize')
-            if step_size is None:
+            lot_size = await self.binance.get_lot_size(symbol)
+            if lot_size is None:
                 return
+            step_size, precision, tick_exp = lot_size
             
-            quantity = round_quantity(quantity_to_buy_usdt / price, step_size)
-            order = self.binance.place_market_order(Client.SIDE_BUY, symbol, quantity)
+            quantity = round_quantity(quantity_to_buy_usdt / price, step_size, precision, tick_exp)
+            order = await self.binance.place_market_order(Client.SIDE_BUY, symbol, quantity)
             
             if order:
                 usdt_equivalent = float(price * quantity)
                 self.traded_value_adjustment += usdt_equivalent
+                self._usdt_free -= usdt_equivalent
                 
                 # Save to Database - trade_date is automatically current time
                 order_id = order.get('orderId', str(int(time.time()*1000)))
@@ -435,52 +602,63 @@ class TradingBot:
             msg = f"{Config.WARNING_EMOJI} #{symbol} insufficient balance for buy\n<b>Balance:</b> ${usdt_balance:.2f}"
             await self.telegram.send_message(msg)
 
-    async def _handle_short_cross(self, symbol: str, price: float):
-        """SHORT CROSS - Sell operation"""
+    async def _handle_short_cross(self, symbol: str, price: float, asset_free: float):
+        """SHORT CROSS - Sell operation (asset_free: free balance read in process_symbol)"""
         logging.info(f"{symbol} SHORT CROSS - Sell signal (Price: {price})")
         
-        asset = symbol.replace("USDT", "")
-        asset_free, asset_locked = self.binance.get_asset_balance(asset)
         asset_balance = asset_free
         
-        min_notional = self.binance.get_filter_value(symbol, 'NOTIONAL', 'minNotional')
+        min_notional = await self.binance.get_filter_value(symbol, 'NOTIONAL', 'minNotional')
         if min_notional is None:
             return
 
         usdt_value = asset_balance * price
 
         if usdt_value >= min_notional:
-            step_size = self.binance.get_filter_value(symbol, 'LOT_SIZE', 'stepSize')
-            if step_size is None:
+            lot_size = await self.binance.get_lot_size(symbol)
+            if lot_size is None:
                 return
-
-            quantity_to_sell = round_quantity(asset_balance, step_size)
-            
-            # This check is a bit complex, ensuring we don't sell dust
-            if quantity_to_sell * price < min_notional and asset_balance > quantity_to_sell:
-                # Try again by rounding down one step_size unit
-                quantity_to_sell = round_quantity(asset_balance - step_size, step_size)
+            step_size, precision, tick_exp = lot_size
+
+            if step_size > 0:
+                # Whole LOT_SIZE steps in the balance (same factor as round_quantity, floored once)
+                factor = lot_factor(step_size, tick_exp)
+                n_steps = math.floor(asset_balance * factor)
+                quantity_to_sell = round(n_steps / factor, precision)
+
+                # This check is a bit complex, ensuring we don't sell dust
+                if quantity_to_sell * price < min_notional and asset_balance > quantity_to_sell:
+                    # Try again one step_size unit lower
+                    quantity_to_sell = round(max(n_steps - 1, 0) / factor, precision)
+            else:
+                quantity_to_sell = asset_balance
 
             if quantity_to_sell > 0:
-                order = self.binance.place_market_order(Client.SIDE_SELL, symbol, quantity_to_sell)
+                order = await self.binance.place_market_order(Client.SIDE_SELL, symbol, quantity_to_sell)
                 
                 if order:
                     self.traded_value_adjustment -= usdt_value
+                    self._usdt_free += quantity_to_sell * price
                     
                     # Save to Database - trade_date is automatically current time
                     order_id = order.get('orderId', str(int(time.time()*1000)))
                     status = 'FILLED' if not self.dry_run else 'FILLED_DRY_RUN'
-                    self.db.add_trade(
-                        symbol=symbol, 
-                        side='SELL', 
-                        quantity=quantity_to_sell, 
-                        price=price, 
-                        value=usdt_value,
-                        order_id=str(order_id), 
-                        status=status, 
-                        is_dry_run=self.dry_run
-                        # no trade_date parameter - uses current time automatically
-                    )
+                    with self.db.transaction():
+                        self.db.add_trade(
+                            symbol=symbol, 
+                            side='SELL', 
+                            quantity=quantity_to_sell, 
+                            price=price, 
+                            value=usdt_value,
+                            order_id=str(order_id), 
+                            status=status, 
+                            is_dry_run=self.dry_run
+                            # no trade_date parameter - uses current time automatically
+                        )
+                        
+                        # Update market quantity (after sell)
+                        if not self.dry_run:
+                            self.db.update_market(symbol, quantity=int(usdt_value))
                     
                     await self.telegram.send_message(
                         f"{self.trade_prefix}{Config.SELL_EMOJI} #{symbol} SELL\n"
@@ -488,26 +666,41 @@ class TradingBot:
                         f"<b>Price:</b> ${price:.2f}\n"
                         f"<b>Total:</b> ${usdt_value:.2f}"
                     )
-                    
-                    # Update market quantity (after sell)
-                    if not self.dry_run:
-                        self.db.update_market(symbol, quantity=int(usdt_value))
         else:
             msg = f"{Config.WARNING_EMOJI} #{symbol} insufficient balance for sell\n<b>Value:</b> ${usdt_value:.2f}"
             await self.telegram.send_message(msg)
 
+    @staticmethod
+    def _write_btc_trend(trend: str):
+        """Write the BTC trend file, skipping the write when it already holds this trend"""
+        try:
+            if Config.BTC_TREND_FILE.read_text() == trend:
+                return
+        except FileNotFoundError:
+            pass
+        Config.BTC_TREND_FILE.write_text(trend)
+
     async def finalize_report(self):
         """Final report and portfolio snapshot"""
-        usdt_free, usdt_locked = self.binance.get_asset_balance('USDT')
+        if self._btc_trend is not None:
+            try:
+                await asyncio.to_thread(self._write_btc_trend, self._btc_trend)
+            except OSError as e:
+                logging.error(f"BTC trend file error: {e}")
+        
+        usdt_free, usdt_locked = await self.binance.get_asset_balance('USDT')
         final_usdt_balance = usdt_free + usdt_locked
         
         # Add USDT to portfolio as well
-        self.db.update_portfolio('USDT', usdt_free, usdt_locked, 1.0, final_usdt_balance)
+        self._portfolio_rows.append(('USDT', usdt_free, usdt_locked, 1.0, final_usdt_balance))
         
         total_portfolio_value = final_usdt_balance + self.total_crypto_value + self.traded_value_adjustment
         
-        # Add portfolio snapshot
-        self.db.add_portfolio_snapshot(total_portfolio_value, final_usdt_balance, self.total_crypto_value)
+        # Portfolio rows of every symbol and the snapshot in one commit
+        with self.db.transaction():
+            self.db.bulk_update_portfolio(self._portfolio_rows)
+            self.db.add_portfolio_snapshot(total_portfolio_value, final_usdt_balance, self.total_crypto_value)
+        self._portfolio_rows.clear()
         
         await self.telegram.send_message(f"💰 USDT BALANCE: ${final_usdt_balance:.2f}")
         await self.telegram.send_message(f"📊 TOTAL PORTFOLIO: ${total_portfolio_value:.2f}")
@@ -535,18 +728,21 @@ async def main():
         sys.exit(1)
     
     # Binance service
-    binance_service = BinanceService.from_file(Config.CREDENTIALS_FILE, dry_run=is_dry_run)
+    binance_service = await BinanceService.from_file(Config.CREDENTIALS_FILE, dry_run=is_dry_run)
     if not binance_service:
         sys.exit(1)
 
-    # Telegram service
-    telegram_service = TelegramService.from_files(Config.TG_TOKEN_FILE, Config.TG_CHAT_ID_FILE)
-    if not telegram_service:
-        sys.exit(1)
-
-    # Start bot
-    bot = TradingBot(binance_service, telegram_service, db)
-    await bot.run()
+    try:
+        # Telegram service
+        telegram_service = TelegramService.from_files(Config.TG_TOKEN_FILE, Config.TG_CHAT_ID_FILE)
+        if not telegram_service:
+            sys.exit(1)
+
+        # Start bot
+        bot = TradingBot(binance_service, telegram_service, db)
+        await bot.run()
+    finally:
+        await binance_service.close()
     
     logging.info("=" * 60)
     logging.info("Bot finished successfully")